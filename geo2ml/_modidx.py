@@ -21,7 +21,10 @@ d = { 'settings': { 'branch': 'main',
                                          'geo2ml.data.coordinates.list_to_affine': ( 'data.coordinates.html#list_to_affine',
                                                                                      'geo2ml/data/coordinates.py')},
             'geo2ml.data.cv': { 'geo2ml.data.cv._corners2rotatedbbox': ('data.cv.html#_corners2rotatedbbox', 'geo2ml/data/cv.py'),
+                                'geo2ml.data.cv._image_info': ('data.cv.html#_image_info', 'geo2ml/data/cv.py'),
+                                'geo2ml.data.cv._list_images': ('data.cv.html#_list_images', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv._process_shp_to_coco': ('data.cv.html#_process_shp_to_coco', 'geo2ml/data/cv.py'),
+                                'geo2ml.data.cv._vector_tiles': ('data.cv.html#_vector_tiles', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv.calc_bearing': ('data.cv.html#calc_bearing', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv.coco_to_shp': ('data.cv.html#coco_to_shp', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv.nor_theta': ('data.cv.html#nor_theta', 'geo2ml/data/cv.py'),
@@ -29,28 +32,146 @@ d = { 'settings': { 'branch': 'main',
                                 'geo2ml.data.cv.shp_to_coco_results': ('data.cv.html#shp_to_coco_results', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv.shp_to_yolo': ('data.cv.html#shp_to_yolo', 'geo2ml/data/cv.py'),
                                 'geo2ml.data.cv.yolo_to_shp': ('data.cv.html#yolo_to_shp', 'geo2ml/data/cv.py')},
-            'geo2ml.data.postproc': { 'geo2ml.data.postproc.do_nms': ('data.postprocessing.html#do_nms', 'geo2ml/data/postproc.py'),
+            'geo2ml.data.datasets': { 'geo2ml.data.datasets.WindowDataset': ('data.datasets.html#windowdataset', 'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset.__getitem__': ( 'data.datasets.html#windowdataset.__getitem__',
+                                                                                          'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset.__getstate__': ( 'data.datasets.html#windowdataset.__getstate__',
+                                                                                           'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset.__init__': ( 'data.datasets.html#windowdataset.__init__',
+                                                                                       'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset.__iter__': ( 'data.datasets.html#windowdataset.__iter__',
+                                                                                       'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset.__len__': ( 'data.datasets.html#windowdataset.__len__',
+                                                                                      'geo2ml/data/datasets.py'),
+                                      'geo2ml.data.datasets.WindowDataset._open': ( 'data.datasets.html#windowdataset._open',
+                                                                                    'geo2ml/data/datasets.py')},
+            'geo2ml.data.postproc': { 'geo2ml.data.postproc._box_area': ('data.postprocessing.html#_box_area', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._box_edges': ('data.postprocessing.html#_box_edges', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._box_pairs': ('data.postprocessing.html#_box_pairs', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._candidate_pairs': ( 'data.postprocessing.html#_candidate_pairs',
+                                                                                 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._chunks': ('data.postprocessing.html#_chunks', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._components': ( 'data.postprocessing.html#_components',
+                                                                            'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._greedy_suppress': ( 'data.postprocessing.html#_greedy_suppress',
+                                                                                 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._poly_edges': ( 'data.postprocessing.html#_poly_edges',
+                                                                            'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._sort_order': ( 'data.postprocessing.html#_sort_order',
+                                                                            'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._tile_nms': ('data.postprocessing.html#_tile_nms', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._tiled_first_pass': ( 'data.postprocessing.html#_tiled_first_pass',
+                                                                                  'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc._union_groups': ( 'data.postprocessing.html#_union_groups',
+                                                                              'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.benchmark_nms': ( 'data.postprocessing.html#benchmark_nms',
+                                                                              'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.do_nms': ('data.postprocessing.html#do_nms', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.do_soft_nms': ( 'data.postprocessing.html#do_soft_nms',
+                                                                            'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.do_tiled_nms': ( 'data.postprocessing.html#do_tiled_nms',
+                                                                             'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.do_wbf': ('data.postprocessing.html#do_wbf', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.merge_split_instances': ( 'data.postprocessing.html#merge_split_instances',
+                                                                                      'geo2ml/data/postproc.py'),
                                       'geo2ml.data.postproc.non_max_suppression_fast': ( 'data.postprocessing.html#non_max_suppression_fast',
                                                                                          'geo2ml/data/postproc.py'),
                                       'geo2ml.data.postproc.non_max_suppression_poly': ( 'data.postprocessing.html#non_max_suppression_poly',
                                                                                          'geo2ml/data/postproc.py'),
-                                      'geo2ml.data.postproc.poly_IoU': ('data.postprocessing.html#poly_iou', 'geo2ml/data/postproc.py')},
-            'geo2ml.data.tabular': { 'geo2ml.data.tabular.array_to_longform': ( 'data.tabular.html#array_to_longform',
+                                      'geo2ml.data.postproc.poly_IoU': ('data.postprocessing.html#poly_iou', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.soft_nms': ('data.postprocessing.html#soft_nms', 'geo2ml/data/postproc.py'),
+                                      'geo2ml.data.postproc.weighted_boxes_fusion': ( 'data.postprocessing.html#weighted_boxes_fusion',
+                                                                                      'geo2ml/data/postproc.py')},
+            'geo2ml.data.tabular': { 'geo2ml.data.tabular._raster_bounds': ('data.tabular.html#_raster_bounds', 'geo2ml/data/tabular.py'),
+                                     'geo2ml.data.tabular._vector_meta': ('data.tabular.html#_vector_meta', 'geo2ml/data/tabular.py'),
+                                     'geo2ml.data.tabular.array_to_longform': ( 'data.tabular.html#array_to_longform',
                                                                                 'geo2ml/data/tabular.py'),
                                      'geo2ml.data.tabular.drop_small_classes': ( 'data.tabular.html#drop_small_classes',
                                                                                  'geo2ml/data/tabular.py'),
+                                     'geo2ml.data.tabular.read_vector': ('data.tabular.html#read_vector', 'geo2ml/data/tabular.py'),
                                      'geo2ml.data.tabular.sample_raster_with_points': ( 'data.tabular.html#sample_raster_with_points',
                                                                                         'geo2ml/data/tabular.py'),
                                      'geo2ml.data.tabular.sample_raster_with_polygons': ( 'data.tabular.html#sample_raster_with_polygons',
-                                                                                          'geo2ml/data/tabular.py')},
-            'geo2ml.data.tiling': { 'geo2ml.data.tiling.Tiler': ('data.tiling.html#tiler', 'geo2ml/data/tiling.py'),
+                                                                                          'geo2ml/data/tabular.py'),
+                                     'geo2ml.data.tabular.vector_crs': ('data.tabular.html#vector_crs', 'geo2ml/data/tabular.py'),
+                                     'geo2ml.data.tabular.write_vector': ('data.tabular.html#write_vector', 'geo2ml/data/tabular.py')},
+            'geo2ml.data.tiling': { 'geo2ml.data.tiling.BlockCache': ('data.tiling.html#blockcache', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.BlockCache.__init__': ( 'data.tiling.html#blockcache.__init__',
+                                                                                'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.BlockCache._block': ('data.tiling.html#blockcache._block', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.BlockCache.clear': ('data.tiling.html#blockcache.clear', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.BlockCache.read': ('data.tiling.html#blockcache.read', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore': ('data.tiling.html#chipstore', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.__getitem__': ( 'data.tiling.html#chipstore.__getitem__',
+                                                                                  'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.__init__': ( 'data.tiling.html#chipstore.__init__',
+                                                                               'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.__len__': ('data.tiling.html#chipstore.__len__', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore._idx': ('data.tiling.html#chipstore._idx', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.create': ('data.tiling.html#chipstore.create', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.get_profile': ( 'data.tiling.html#chipstore.get_profile',
+                                                                                  'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.get_transform': ( 'data.tiling.html#chipstore.get_transform',
+                                                                                    'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.ChipStore.is_store': ( 'data.tiling.html#chipstore.is_store',
+                                                                               'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic': ('data.tiling.html#rastermosaic', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.__enter__': ( 'data.tiling.html#rastermosaic.__enter__',
+                                                                                   'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.__exit__': ( 'data.tiling.html#rastermosaic.__exit__',
+                                                                                  'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.__init__': ( 'data.tiling.html#rastermosaic.__init__',
+                                                                                  'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic._sources': ( 'data.tiling.html#rastermosaic._sources',
+                                                                                  'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.close': ( 'data.tiling.html#rastermosaic.close',
+                                                                               'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.dataset_mask': ( 'data.tiling.html#rastermosaic.dataset_mask',
+                                                                                      'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.RasterMosaic.read': ('data.tiling.html#rastermosaic.read', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.Tiler': ('data.tiling.html#tiler', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.Tiler.__init__': ('data.tiling.html#tiler.__init__', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.Tiler.create_grid': ('data.tiling.html#tiler.create_grid', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.Tiler.get_window': ('data.tiling.html#tiler.get_window', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.Tiler.sample_grid': ('data.tiling.html#tiler.sample_grid', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.Tiler.tile_and_rasterize_vector': ( 'data.tiling.html#tiler.tile_and_rasterize_vector',
                                                                                             'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.Tiler.tile_raster': ('data.tiling.html#tiler.tile_raster', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.Tiler.tile_vector': ('data.tiling.html#tiler.tile_vector', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._HandlePool': ('data.tiling.html#_handlepool', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._HandlePool.__init__': ( 'data.tiling.html#_handlepool.__init__',
+                                                                                 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._HandlePool.close': ('data.tiling.html#_handlepool.close', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._HandlePool.get': ('data.tiling.html#_handlepool.get', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._annotated_cells': ('data.tiling.html#_annotated_cells', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._append_manifest': ('data.tiling.html#_append_manifest', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._checksum': ('data.tiling.html#_checksum', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._chip_checksum': ('data.tiling.html#_chip_checksum', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._chip_footprints': ('data.tiling.html#_chip_footprints', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._clip_to_cells': ('data.tiling.html#_clip_to_cells', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._count_block_reads': ( 'data.tiling.html#_count_block_reads',
+                                                                               'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._creation_options': ('data.tiling.html#_creation_options', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._encode_labels': ('data.tiling.html#_encode_labels', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._fingerprint': ('data.tiling.html#_fingerprint', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._grid_windows': ('data.tiling.html#_grid_windows', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._has_valid_data': ('data.tiling.html#_has_valid_data', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._instance_edges': ('data.tiling.html#_instance_edges', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._is_empty': ('data.tiling.html#_is_empty', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._prune_store': ('data.tiling.html#_prune_store', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._raster_files': ('data.tiling.html#_raster_files', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._rasterize_strip': ('data.tiling.html#_rasterize_strip', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._read_label_map': ('data.tiling.html#_read_label_map', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._read_manifest': ('data.tiling.html#_read_manifest', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._window_boxes': ('data.tiling.html#_window_boxes', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._write_chip': ('data.tiling.html#_write_chip', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._write_chips': ('data.tiling.html#_write_chips', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling._write_manifest': ('data.tiling.html#_write_manifest', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.benchmark_codecs': ('data.tiling.html#benchmark_codecs', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.blending_window': ('data.tiling.html#blending_window', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.copy_sum': ('data.tiling.html#copy_sum', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.fix_multipolys': ('data.tiling.html#fix_multipolys', 'geo2ml/data/tiling.py'),
+                                    'geo2ml.data.tiling.open_raster': ('data.tiling.html#open_raster', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.untile_raster': ('data.tiling.html#untile_raster', 'geo2ml/data/tiling.py'),
                                     'geo2ml.data.tiling.untile_vector': ('data.tiling.html#untile_vector', 'geo2ml/data/tiling.py')},
             'geo2ml.plotting': { 'geo2ml.plotting.plot_coco_instance': ('plotting.html#plot_coco_instance', 'geo2ml/plotting.py'),
@@ -133,13 +133,15 @@ def gdf_to_px(
     precision: int = None,
     outpath=None,
     override_crs=False,
+    affine_obj: affine.Affine = None,
 ) -> gpd.GeoDataFrame:
     """Adapted from https://solaris.readthedocs.io/en/latest/_modules/solaris/vector/polygon.html#geojson_to_px_gdf
-    Converts `gdf` to pixel coordinates based on image in `im_path`
+    Converts `gdf` to pixel coordinates based on image in `im_path`, or on `affine_obj` if it is provided
     """
 
-    with rio.open(im_path) as im:
-        affine_obj = im.transform
+    if affine_obj is None:
+        with rio.open(im_path) as im:
+            affine_obj = im.transform
 
     transformed_gdf = affine_transform_gdf(
         gdf, affine_obj=affine_obj, inverse=True, precision=precision, geom_col=geom_col
@@ -165,9 +167,10 @@ def georegister_px_df(
     output_path=None,
 ) -> gpd.GeoDataFrame:
     "Convert geodataframe from pixel coordinates to `crs`, using `affine_obj` as the reference"
-    with rio.open(im_path) as im:
-        affine_obj = im.transform
-        crs = im.crs
+    if im_path is not None:
+        with rio.open(im_path) as im:
+            affine_obj = im.transform
+            crs = im.crs
 
     tmp_df = affine_transform_gdf(
         df, affine_obj, geom_col=geom_col, precision=precision
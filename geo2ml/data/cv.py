@@ -5,6 +5,8 @@ __all__ = ['shp_to_coco', 'coco_to_shp', 'shp_to_coco_results', 'shp_to_yolo', '
 
 # %% ../../nbs/13_data.cv.ipynb 3
 from .coordinates import *
+from .tiling import ChipStore
+from .tabular import read_vector, write_vector
 import rasterio as rio
 from pathlib import Path
 import os
@@ -116,6 +118,58 @@ def _process_shp_to_coco(
     return ann_dict
 
 # %% ../../nbs/13_data.cv.ipynb 9
+def _list_images(raster_path: Path) -> tuple:
+    "Return the `ChipStore` in `raster_path` (or None) and the names of the images in it"
+    if ChipStore.is_store(raster_path):
+        store = ChipStore(raster_path)
+        return store, store.index.cell.tolist()
+    return None, os.listdir(raster_path)
+
+
+def _image_info(raster_path: Path, fname: str, store: ChipStore = None) -> tuple:
+    "Get the transform, crs, height and width of `fname` in `raster_path` or in `store` if provided"
+    if store is not None:
+        prof = store.get_profile(fname)
+        return prof["transform"], prof["crs"], prof["height"], prof["width"]
+    with rio.open(raster_path / fname) as im:
+        return im.transform, im.crs, im.height, im.width
+
+
+def _vector_tiles(shp_path: Path, columns: list = None) -> dict:
+    """Map image names (without suffix) to functions that return the polygons of that image in `shp_path`, with only `columns` if specified.
+    Single-file outputs of `Tiler.tile_vector` (GeoParquet, or a geopackage with a single layer that has a `cell` column)
+    are scanned once and grouped by `cell`, other layers and files are read only when requested.
+    """
+    shp_path = Path(shp_path)
+    if os.path.isdir(shp_path):
+        files = sorted(
+            f
+            for f in os.listdir(shp_path)
+            if f.endswith((".shp", ".geojson", ".parquet"))
+        )
+        return {
+            f.split(".")[0]: (lambda f=f: read_vector(shp_path / f, columns=columns))
+            for f in files
+        }
+    grouped_columns = columns + ["cell"] if columns is not None else None
+    if shp_path.suffix == ".parquet":
+        gdf = read_vector(shp_path, columns=grouped_columns)
+    else:
+        layers = fiona.listlayers(shp_path)
+        with fiona.open(shp_path, layer=layers[0]) as src:
+            grouped = len(layers) == 1 and "cell" in src.schema["properties"]
+        if not grouped:
+            return {
+                l: (lambda l=l: read_vector(shp_path, layer=l, columns=columns))
+                for l in sorted(layers)
+            }
+        gdf = read_vector(shp_path, layer=layers[0], columns=grouped_columns)
+    return {
+        c: (lambda g=g: g.drop(columns="cell").reset_index(drop=True))
+        for c, g in gdf.groupby("cell")
+    }
+
+# %% ../../nbs/13_data.cv.ipynb 10
 def shp_to_coco(
     raster_path: Path,
     shp_path: Path,
@@ -130,7 +184,9 @@ def shp_to_coco(
 ):
     """Create a COCO style dataset from images in `raster_path` and corresponding polygons in `shp_path`, save annotations to `outpath`.
     `shp_path` can be either geopackage containing layers so that each layer corresponds to an image,
-    or a directory containing multiple shp or geojson files, each corresponding to an image
+    a directory containing multiple shp, geojson or parquet files, each corresponding to an image,
+    or a single-layer geopackage or GeoParquet file with a `cell` column, as created by `Tiler.tile_vector`.
+    `raster_path` can be either a directory of images or a `ChipStore`.
     """
 
     coco_dict = {"images": [], "annotations": [], "categories": coco_categories}
@@ -139,32 +195,15 @@ def shp_to_coco(
     if coco_licenses:
         coco_dict["licenses"] = coco_licenses
     categories = {c["name"]: c["id"] for c in coco_dict["categories"]}
-    if os.path.isdir(shp_path):
-        vector_tiles = [
-            f for f in sorted(os.listdir(shp_path)) if f.endswith((".shp", ".geojson"))
-        ]
-        raster_tiles = sorted(
-            [
-                f
-                for f in os.listdir(raster_path)
-                if f.split(".")[0] in [v.split(".")[0] for v in vector_tiles]
-            ]
-        )
-    elif shp_path.suffix == ".gpkg":
-        layers = sorted(
-            fiona.listlayers(shp_path)
-        )  # Assume that shp_path contains a geopackage with layers named after images
-        raster_tiles = sorted(
-            [f for f in os.listdir(raster_path) if f.split(".")[0] in layers]
-        )
+    store, raster_files = _list_images(raster_path)
+    vector_tiles = _vector_tiles(shp_path, columns=[label_col])
+    raster_tiles = sorted([f for f in raster_files if f.split(".")[0] in vector_tiles])
     ann_id = 1
     for i, r in tqdm(enumerate(raster_tiles)):
         tile_anns = []
-        if os.path.isdir(shp_path):
-            gdf = gpd.read_file(shp_path / vector_tiles[i])
-        elif shp_path.suffix == ".gpkg":
-            gdf = gpd.read_file(shp_path, layer=layers[i])
-        tfmd_gdf = gdf_to_px(gdf, raster_path / r, precision=3)
+        gdf = vector_tiles[r.split(".")[0]]()
+        tfm, _, h, w = _image_info(raster_path, r, store)
+        tfmd_gdf = gdf_to_px(gdf, raster_path / r, precision=3, affine_obj=tfm)
         for row in tfmd_gdf.itertuples():
             category_id = categories[getattr(row, label_col)]
             if box(*row.geometry.bounds).area < min_bbox_area:
@@ -174,8 +213,6 @@ def shp_to_coco(
             )
             ann_id += 1
         if len(tile_anns) > 0:
-            with rio.open(raster_path / r) as im:
-                h, w = im.shape
             coco_dict["images"].append(
                 {"file_name": r, "id": i, "height": h, "width": w}
             )
@@ -186,15 +223,23 @@ def shp_to_coco(
         json.dump(coco_dict, f)
     return
 
-# %% ../../nbs/13_data.cv.ipynb 18
+# %% ../../nbs/13_data.cv.ipynb 19
 def coco_to_shp(
-    coco_data: Path | str, outpath: Path, raster_path: Path, downsample_factor: int = 1
+    coco_data: Path | str,
+    outpath: Path,
+    raster_path: Path,
+    downsample_factor: int = 1,
+    output_format: str = "geojson",
 ):
-    """Generates georeferenced data from a dictionary with coco annotations.
+    """Generates georeferenced data from a dictionary with coco annotations. `raster_path` can be either a directory of images or a `ChipStore`.
+    Each image is saved into `outpath` as a `geojson` or `parquet` file, depending on `output_format`.
     TODO handle multipolygons better"""
 
+    if output_format not in ["geojson", "parquet"]:
+        raise Exception("Unknown output format, must be either `geojson` or `parquet`")
     if not os.path.exists(outpath):
         os.makedirs(outpath)
+    store, _ = _list_images(raster_path)
 
     with open(coco_data) as f:
         coco_dict = json.load(f)
@@ -293,11 +338,12 @@ def coco_to_shp(
         )
         if len(scores) != 0:
             gdf["score"] = scores
-        tfmd_gdf = georegister_px_df(gdf, raster_path / i["file_name"])
-        tfmd_gdf.to_file(outpath / f'{i["file_name"][:-4]}.geojson', driver="GeoJSON")
+        tfm, crs, _, _ = _image_info(raster_path, i["file_name"], store)
+        tfmd_gdf = georegister_px_df(gdf, affine_obj=tfm, crs=crs)
+        write_vector(tfmd_gdf, outpath / f'{Path(i["file_name"]).stem}.{output_format}')
     return
 
-# %% ../../nbs/13_data.cv.ipynb 22
+# %% ../../nbs/13_data.cv.ipynb 23
 def shp_to_coco_results(
     prediction_path: Path,
     raster_path: Path,
@@ -309,30 +355,17 @@ def shp_to_coco_results(
     """Convert vector predictions into coco result format to be fed into COCO evaluator
 
     `prediction_path` can be either geopackage containing layers so that each layer corresponds to an image,
-    or a directory containing multiple shp or geojson files, each corresponding to an image
+    a directory containing multiple shp, geojson or parquet files, each corresponding to an image,
+    or a single-layer geopackage or GeoParquet file with a `cell` column, as created by `Tiler.tile_vector`.
+    `raster_path` can be either a directory of images or a `ChipStore`.
     """
 
     with open(coco_dict) as f:
         coco_dict = json.load(f)
+    store, raster_files = _list_images(raster_path)
 
-    if os.path.isdir(prediction_path):
-        vector_tiles = sorted(
-            [f for f in os.listdir(prediction_path) if f.endswith((".shp", ".geojson"))]
-        )
-        raster_tiles = sorted(
-            [
-                f
-                for f in os.listdir(raster_path)
-                if f.split(".")[0] in [v.split(".")[0] for v in vector_tiles]
-            ]
-        )
-    elif prediction_path.suffix == ".gpkg":
-        layers = sorted(
-            fiona.listlayers(shp_path)
-        )  # Assume that shp_path contains a geopackage with layers named after images
-        raster_tiles = sorted(
-            [f for f in os.listdir(raster_path) if f.split(".")[0] in layers]
-        )
+    vector_tiles = _vector_tiles(prediction_path)
+    raster_tiles = sorted([f for f in raster_files if f.split(".")[0] in vector_tiles])
     results = []
     for i in tqdm(range_of(raster_tiles)):
         for im_id, im in enumerate(coco_dict["images"]):
@@ -341,11 +374,11 @@ def shp_to_coco_results(
         image_id = coco_dict["images"][im_id]["id"]
         h = coco_dict["images"][im_id]["height"]
         w = coco_dict["images"][im_id]["width"]
-        if os.path.isdir(prediction_path):
-            gdf = gpd.read_file(prediction_path / vector_tiles[i])
-        elif shp_path.suffix == ".gpkg":
-            gdf = gpd.read_file(prediction_path, layer=layers[i])
-        tfmd_gdf = gdf_to_px(gdf, raster_path / raster_tiles[i], precision=3)
+        gdf = vector_tiles[raster_tiles[i].split(".")[0]]()
+        tfm, _, _, _ = _image_info(raster_path, raster_tiles[i], store)
+        tfmd_gdf = gdf_to_px(
+            gdf, raster_path / raster_tiles[i], precision=3, affine_obj=tfm
+        )
         for row in tfmd_gdf.itertuples():
             res = {
                 "image_id": image_id,
@@ -370,7 +403,7 @@ def shp_to_coco_results(
         json.dump(results, f)
     return
 
-# %% ../../nbs/13_data.cv.ipynb 27
+# %% ../../nbs/13_data.cv.ipynb 28
 def shp_to_yolo(
     raster_path: Path,
     shp_path: Path,
@@ -383,41 +416,26 @@ def shp_to_yolo(
 ):
     """Convert shapefiles in `shp_path` to YOLO style dataset. Creates a folder `labels` and `dataset_name.yaml`  to `outpath`
     `shp_path` can be either geopackage containing layers so that each layer corresponds to an image,
-    or a directory containing multiple shp or geojson files, each corresponding to a single image.
+    a directory containing multiple shp, geojson or parquet files, each corresponding to a single image,
+    or a single-layer geopackage or GeoParquet file with a `cell` column, as created by `Tiler.tile_vector`.
+    `raster_path` can be either a directory of images or a `ChipStore`.
     """
-    if os.path.isdir(shp_path):
-        vector_tiles = sorted(
-            [f for f in os.listdir(shp_path) if f.endswith((".shp", ".geojson"))]
-        )
-        raster_tiles = sorted(
-            [
-                f
-                for f in os.listdir(raster_path)
-                if f.split(".")[0] in [v.split(".")[0] for v in vector_tiles]
-            ]
-        )
-    elif shp_path.suffix == ".gpkg":
-        layers = sorted(
-            fiona.listlayers(shp_path)
-        )  # Assume that shp_path contains a geopackage with layers named after images
-        raster_tiles = sorted(
-            [f for f in os.listdir(raster_path) if f.split(".")[0] in layers]
-        )
+    store, raster_files = _list_images(raster_path)
+    vector_tiles = _vector_tiles(shp_path, columns=[label_col])
+    raster_tiles = sorted([f for f in raster_files if f.split(".")[0] in vector_tiles])
     ann_path = outpath / "labels"
     os.makedirs(ann_path, exist_ok=True)
     names = {n: i for i, n in enumerate(names)}
     for i, r in tqdm(enumerate(raster_tiles)):
-        if os.path.isdir(shp_path):
-            gdf = gpd.read_file(shp_path / vector_tiles[i])
-        elif shp_path.suffix == ".gpkg":
-            gdf = gpd.read_file(shp_path, layer=layers[i])
+        gdf = vector_tiles[r.split(".")[0]]()
         if ann_format == "rotated box":
             gdf["geometry"] = gdf.geometry.apply(
                 lambda row: row.minimum_rotated_rectangle
             )
-        tfmd_gdf = gdf_to_px(gdf, raster_path / r, precision=3)  # to pixel coordinates
-        with rio.open(raster_path / r) as im:
-            h, w = im.shape
+        tfm, _, h, w = _image_info(raster_path, r, store)
+        tfmd_gdf = gdf_to_px(
+            gdf, raster_path / r, precision=3, affine_obj=tfm
+        )  # to pixel coordinates
         anns = []
         for row in tfmd_gdf.itertuples():
             cat_id = names[getattr(row, label_col)]
@@ -462,7 +480,7 @@ def shp_to_yolo(
         for n in names.keys():
             dest.write(f"  {names[n]}: {n}\n")
 
-# %% ../../nbs/13_data.cv.ipynb 33
+# %% ../../nbs/13_data.cv.ipynb 34
 def yolo_to_shp(
     prediction_path: Path,
     raster_path: Path,
@@ -470,9 +488,11 @@ def yolo_to_shp(
     outpath: Path,
     downsample_factor: int = 1,
     ann_format: str = "polygon",
+    output_format: str = "geojson",
 ):
     """Convert predicted files in `predictions` to georeferenced data based on files in `images`.
     ann_format is one of `polygon`, `xyxy`, `xywh`, `xyxyn`, `xywhn`.
+    Each prediction file is saved into `outpath` as a `geojson` or `parquet` file, depending on `output_format`.
     """
 
     if ann_format not in ["polygon", "xyxy", "xywh", "xyxyn", "xywhn"]:
@@ -480,13 +500,16 @@ def yolo_to_shp(
             f"ann_format must be one of polygon, xyxy, xywh, xyxyn, xywhn, was {ann_format}"
         )
         return
+    if output_format not in ["geojson", "parquet"]:
+        raise Exception("Unknown output format, must be either `geojson` or `parquet`")
     if not os.path.exists(outpath):
         os.makedirs(outpath, exist_ok=True)
 
     pred_files = os.listdir(prediction_path)
+    store, raster_files = _list_images(raster_path)
     raster_tiles = [
         f
-        for f in os.listdir(raster_path)
+        for f in raster_files
         if f.split(".")[0] in [v.split(".")[0] for v in pred_files]
     ]
     yolo_dict = yaml.safe_load(Path(yolo_path).read_text())
@@ -496,8 +519,7 @@ def yolo_to_shp(
         with open(prediction_path / p, "r") as f:
             preds = [line.rstrip() for line in f]
         matching_image = [i for i in raster_tiles if p.split(".")[0] in i][0]
-        with rio.open(raster_path / matching_image) as im:
-            h, w = im.shape
+        tfm, crs, h, w = _image_info(raster_path, matching_image, store)
         label_ids = []
         labels = []
         polys = []
@@ -547,6 +569,6 @@ def yolo_to_shp(
         gdf = gpd.GeoDataFrame(
             {"label": labels, "label_id": label_ids, "geometry": polys, "score": scores}
         )
-        tfmd_gdf = georegister_px_df(gdf, raster_path / matching_image)
-        tfmd_gdf.to_file(outpath / p.replace("txt", "geojson"), driver="GeoJSON")
+        tfmd_gdf = georegister_px_df(gdf, affine_obj=tfm, crs=crs)
+        write_vector(tfmd_gdf, outpath / f'{p.split(".")[0]}.{output_format}')
     return
@@ -0,0 +1,136 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/15_data.datasets.ipynb.
+
+# %% auto 0
+__all__ = ['WindowDataset']
+
+# %% ../../nbs/15_data.datasets.ipynb 4
+import rasterio as rio
+import rasterio.windows as rio_windows
+import rasterio.features as rio_features
+import numpy as np
+import geopandas as gpd
+from fastcore.basics import *
+import os
+from pathlib import Path
+from .tiling import Tiler, BlockCache, open_raster, _encode_labels
+from .tabular import read_vector
+
+# %% ../../nbs/15_data.datasets.ipynb 6
+class WindowDataset:
+    """
+    Map-style dataset that reads the cells of `tiler.grid` on demand from the raster the grid was created from.
+    If `path_to_vector` is provided, returns tuples of image and either a rasterized mask or the annotations in pixel coordinates.
+    Classes are encoded according to `label_map` written by `Tiler.tile_and_rasterize_vector` if it is given.
+    """
+
+    def __init__(
+        self,
+        tiler: Tiler,
+        path_to_vector: Path | str = None,
+        column: str = None,
+        target: str = "mask",
+        gpkg_layer: str = None,
+        cache_bytes: int = 2**28,
+        label_map: Path | str = None,
+    ):
+        if tiler.grid is None:
+            raise Exception(
+                "No raster grid specified, use Tiler.create_grid to determine grid limits"
+            )
+        if target not in ["mask", "annotations"]:
+            raise Exception("Unknown target, must be either `mask` or `annotations`")
+        if (
+            path_to_vector is not None
+            and Path(path_to_vector).suffix == ".gpkg"
+            and not gpkg_layer
+        ):
+            raise Exception("`path_to_vector` is .gpkg but no `gpkg_layer` specified")
+        store_attr("path_to_vector,column,target,cache_bytes")
+        self.path_to_raster = tiler.source_raster
+        self.grid = tiler.grid
+        self.windows = tiler.windows
+        self.vector = None
+        self.label_map = None
+        if path_to_vector is not None:
+            # Masks need only the label column, and only the features within the grid are needed for either target
+            vector = read_vector(
+                path_to_vector,
+                layer=gpkg_layer,
+                columns=[column] if column is not None and target == "mask" else None,
+                bbox=self.grid.total_bounds,
+                bbox_crs=self.grid.crs,
+            )
+            vector = vector.to_crs(self.grid.crs)
+            if column is not None:
+                all_values = (
+                    None
+                    if label_map
+                    else read_vector(
+                        path_to_vector,
+                        layer=gpkg_layer,
+                        columns=[column],
+                        read_geometry=False,
+                    )[column]
+                )
+                vector["label"], self.label_map = _encode_labels(
+                    vector[column], label_map, all_values
+                )  # Same encoding as in Tiler.tile_and_rasterize_vector
+            else:
+                vector["label"] = 1
+            self.vector = vector
+        self._pid = None
+        self._src = None
+        self._cache = None
+
+    def __getstate__(self):
+        # Dataset handles can't be pickled, they are reopened in the new process
+        state = self.__dict__.copy()
+        state.update({"_pid": None, "_src": None, "_cache": None})
+        return state
+
+    def _open(self):
+        "Get the dataset handle and cache of the current process, opening them if needed"
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._src = open_raster(self.path_to_raster)
+            self._cache = BlockCache(self.cache_bytes)
+        return self._src
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __getitem__(self, idx: int):
+        row = self.windows.iloc[idx]
+        window = rio_windows.Window(row.col_off, row.row_off, row.width, row.height)
+        src = self._open()
+        image = self._cache.read(src, window)
+        if self.vector is None:
+            return image
+        tfm = rio_windows.transform(window, src.transform)
+        cell = self.grid.geometry.iloc[idx]
+        tempvector = self.vector.iloc[
+            self.vector.sindex.query(cell, predicate="intersects")
+        ]
+        if self.target == "mask":
+            mask = np.zeros(
+                (window.height, window.width),
+                dtype=rio.dtypes.get_minimum_dtype(self.vector["label"].max()),
+            )
+            if len(tempvector) > 0:
+                rio_features.rasterize(
+                    zip(tempvector.geometry, tempvector["label"]),
+                    out=mask,
+                    transform=tfm,
+                )
+            return image, mask
+        anns = tempvector.clip(cell, keep_geom_type=True)
+        inv = ~tfm
+        anns["geometry"] = anns.geometry.affine_transform(
+            [inv.a, inv.b, inv.d, inv.e, inv.xoff, inv.yoff]
+        )
+        return image, anns.set_crs(None, allow_override=True)
+
+    def __iter__(self):
+        # Iterating in the grid order reuses the cached blocks between neighbouring windows
+        for i in range(len(self)):
+            yield self[i]
@@ -1,19 +1,234 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/14_data.postprocessing.ipynb.
 
 # %% auto 0
-__all__ = ['non_max_suppression_fast', 'poly_IoU', 'non_max_suppression_poly', 'do_nms']
+__all__ = ['non_max_suppression_fast', 'benchmark_nms', 'soft_nms', 'weighted_boxes_fusion', 'poly_IoU',
+           'non_max_suppression_poly', 'do_nms', 'do_tiled_nms', 'do_soft_nms', 'do_wbf', 'merge_split_instances']
 
 # %% ../../nbs/14_data.postprocessing.ipynb 3
 import numpy as np
+import itertools
+import pandas as pd
 import geopandas as gpd
+import shapely
+import time
+import heapq
+from concurrent.futures import ProcessPoolExecutor
 from shapely.geometry import Polygon
 
 # %% ../../nbs/14_data.postprocessing.ipynb 6
+def _sort_order(scores, area, sort_criterion: str = "score"):
+    "Indices in the order of processing, from the highest `sort_criterion` to the lowest"
+    if sort_criterion == "score":
+        idxs = np.argsort(scores)
+    elif sort_criterion == "area":
+        idxs = np.argsort(area)
+    else:
+        print('Unknown sort criteria, reverting to "score"')
+        idxs = np.argsort(scores)
+    return idxs[::-1]
+
+
+def _chunks(counts, max_pairs: int):
+    "Split the rows with `counts` candidates to consecutive slices with at most `max_pairs` candidates or a single row"
+    cum, start = np.cumsum(counts), 0
+    while start < len(counts):
+        stop = max(
+            start + 1,
+            np.searchsorted(cum, (cum[start - 1] if start else 0) + max_pairs, "right"),
+        )
+        yield start, stop
+        start = stop
+
+
+def _box_pairs(x1, y1, x2, y2, max_pairs: int = 2**22, max_span: int = 64):
+    """Yield the pairs of distinct indices of the boxes `(x1, y1, x2, y2)` that intersect, including the boxes that only touch.
+    The boxes are hashed to every cell they span in a uniform grid, with cells as large as the 90th percentile of the box sizes,
+    and only the boxes in the same cell are compared. Each pair is reported only from the cell that contains the lower left corner
+    of the intersection. Boxes that span more than `max_span` cells are compared with all boxes. The candidate pairs are generated
+    at most `max_pairs` at a time, so memory use depends on the number of intersecting boxes instead of the size distribution
+    """
+    n = len(x1)
+    if n == 0:
+        return
+    ext = np.maximum(x2 - x1, y2 - y1)
+    size = np.percentile(ext, 90)
+    ox, oy = x1.min(), y1.min()
+    # at most 2**20 cells per axis to keep the cell keys in range
+    size = max(size, (x2.max() - ox) / 2**20, (y2.max() - oy) / 2**20, 1e-9)
+    cx0, cy0 = ((x1 - ox) // size).astype(np.int64), ((y1 - oy) // size).astype(
+        np.int64
+    )
+    cx1, cy1 = ((x2 - ox) // size).astype(np.int64), ((y2 - oy) // size).astype(
+        np.int64
+    )
+    nx, span = cx1 - cx0 + 1, (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+    large = span > max_span
+
+    def _intersect(src, dst):
+        return (
+            (src != dst)
+            & (np.maximum(x1[src], x1[dst]) <= np.minimum(x2[src], x2[dst]))
+            & (np.maximum(y1[src], y1[dst]) <= np.minimum(y2[src], y2[dst]))
+        )
+
+    # one entry for each cell that each box spans
+    small = np.flatnonzero(~large)
+    box = np.repeat(small, span[small])
+    k = np.arange(len(box)) - np.repeat(
+        np.cumsum(span[small]) - span[small], span[small]
+    )
+    ny = (cy1[small].max() + 1) if len(small) else 1
+    keys = (cx0[box] + k % nx[box]) * ny + cy0[box] + k // nx[box]
+    by_key = np.argsort(keys, kind="stable")
+    keys, box = keys[by_key], box[by_key]
+    # each entry is compared with the later entries in its cell, and the pairs are reported in both directions
+    hi = np.searchsorted(keys, keys, "right")
+    for start, end in _chunks(hi - np.arange(len(keys)) - 1, max_pairs):
+        rows = np.arange(start, end)
+        counts = hi[rows] - rows - 1
+        pos = np.repeat(rows + 1 - np.cumsum(counts) + counts, counts) + np.arange(
+            counts.sum()
+        )
+        src, dst, cell = box[np.repeat(rows, counts)], box[pos], keys[pos]
+        hit = _intersect(src, dst)
+        src, dst, cell = src[hit], dst[hit], cell[hit]
+        ref = ((np.maximum(x1[src], x1[dst]) - ox) // size).astype(np.int64) * ny + (
+            (np.maximum(y1[src], y1[dst]) - oy) // size
+        ).astype(np.int64)
+        src, dst = src[ref == cell], dst[ref == cell]
+        yield np.concatenate((src, dst)), np.concatenate((dst, src))
+    # large boxes against all boxes, and the pairs of small and large boxes in both directions
+    big = np.flatnonzero(large)
+    for start, end in _chunks(np.full(len(big), n), max_pairs):
+        src, dst = np.repeat(big[start:end], n), np.tile(np.arange(n), end - start)
+        hit = _intersect(src, dst)
+        src, dst = src[hit], dst[hit]
+        rev = ~large[dst]
+        yield np.concatenate((src, dst[rev])), np.concatenate((dst, src[rev]))
+
+
+def _candidate_pairs(geoms, predicate: str = "intersects", chunksize: int = 2**16):
+    "Yield the pairs of distinct indices of `geoms` that satisfy `predicate`, queried from an STRtree in chunks of `chunksize` geometries"
+    tree = shapely.STRtree(geoms)
+    for start in range(0, len(geoms), chunksize):
+        src, dst = tree.query(geoms[start : start + chunksize], predicate=predicate)
+        src += start
+        yield src[src != dst], dst[src != dst]
+
+
+def _greedy_suppress(order, src, dst) -> list:
+    """Greedy non-max suppression over the graph where an edge from `src` to `dst` means that `src` suppresses `dst` if it is kept.
+    Boxes are visited in `order` and only the edges pointing to later boxes are followed, so the result is the same as comparing each
+    kept box with all remaining boxes"""
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    later = rank[dst] > rank[src]
+    src, dst = src[later], dst[later]
+    srt = np.argsort(rank[src], kind="stable")
+    src, dst = src[srt], dst[srt]
+    keep = np.ones(len(order), dtype=bool)
+    # Only the boxes that can suppress others need to be visited one by one
+    heads, starts = np.unique(rank[src], return_index=True)
+    ends = np.append(starts[1:], len(src))
+    for i, s, e in zip(order[heads], starts, ends):
+        if keep[i]:
+            keep[dst[s:e]] = False
+    return list(order[keep[order]])
+
+
+def _box_area(boxes):
+    "Area of the `boxes` that are inclusive of their last pixel"
+    return (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+
+
+def _box_edges(
+    boxes,
+    overlap_thresh: float,
+    labels=None,
+    iou: bool = False,
+    with_overlaps: bool = False,
+    rank=None,
+):
+    """Pairs of `boxes` where the first one overlaps more than `overlap_thresh` of the area of the second one, or where their IoU
+    is larger than `overlap_thresh` if `iou` is True. If `labels` are given, only the boxes with the same label are paired, and
+    if `rank` is given, only the pairs where the first box has a lower rank. The overlaps of the pairs are returned as well if
+    `with_overlaps` is True"""
+    # grab the coordinates of the bounding boxes
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = _box_area(boxes)
+    # only the boxes that intersect can overlap. Boxes are inclusive of their last pixel, so they are extended by 1
+    srcs, dsts, overlaps = (
+        [np.zeros(0, dtype=np.int64)],
+        [np.zeros(0, dtype=np.int64)],
+        [np.zeros(0)],
+    )
+    for src, dst in _box_pairs(x1, y1, x2 + 1, y2 + 1):
+        if labels is not None:
+            src, dst = src[labels[src] == labels[dst]], dst[labels[src] == labels[dst]]
+        if rank is not None:
+            src, dst = src[rank[src] < rank[dst]], dst[rank[src] < rank[dst]]
+        # compute the ratio of overlap with respect to the area of the suppressed box or the union
+        w = np.maximum(
+            0, np.minimum(x2[src], x2[dst]) - np.maximum(x1[src], x1[dst]) + 1
+        )
+        h = np.maximum(
+            0, np.minimum(y2[src], y2[dst]) - np.maximum(y1[src], y1[dst]) + 1
+        )
+        overlap = (
+            (w * h) / (area[src] + area[dst] - w * h) if iou else (w * h) / area[dst]
+        )
+        srcs.append(src[overlap > overlap_thresh])
+        dsts.append(dst[overlap > overlap_thresh])
+        overlaps.append(overlap[overlap > overlap_thresh])
+    if with_overlaps:
+        return np.concatenate(srcs), np.concatenate(dsts), np.concatenate(overlaps)
+    return np.concatenate(srcs), np.concatenate(dsts)
+
+
+def _poly_edges(geoms, overlap_thresh: float, labels=None):
+    "Pairs of `geoms` with IoU larger than `overlap_thresh`, in both directions. If `labels` are given, only the geoms with the same label are paired"
+    area = shapely.area(geoms)
+    srcs, dsts = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for src, dst in _candidate_pairs(geoms):
+        # IoU is symmetric, so it is computed once per pair
+        same = (
+            src < dst if labels is None else (src < dst) & (labels[src] == labels[dst])
+        )
+        src, dst = src[same], dst[same]
+        inter = shapely.area(shapely.intersection(geoms[src], geoms[dst]))
+        overlap = inter / (area[src] + area[dst] - inter)
+        hit = overlap > overlap_thresh
+        srcs += [src[hit], dst[hit]]
+        dsts += [dst[hit], src[hit]]
+    return np.concatenate(srcs), np.concatenate(dsts)
+
+
+def _components(n: int, src, dst):
+    "Label the connected components of the graph of `n` nodes and edges from `src` to `dst` with the smallest node of each component"
+    labels = np.arange(n)
+    while True:
+        prev = labels
+        labels = labels.copy()
+        np.minimum.at(labels, src, labels[dst])
+        np.minimum.at(labels, dst, labels[src])
+        labels = labels[labels]
+        if (labels == prev).all():
+            return labels
+
+# %% ../../nbs/14_data.postprocessing.ipynb 7
 # Malisiewicz et al.
 def non_max_suppression_fast(
-    boxes, scores, overlap_thresh: float, sort_criterion: str = "score"
+    boxes,
+    scores,
+    overlap_thresh: float,
+    sort_criterion: str = "score",
+    labels=None,
+    iou: bool = False,
 ):
-    "Possibility to sort boxes by score (default) or area"
+    """Possibility to sort boxes by score (default) or area. Overlaps are computed only for the pairs of boxes
+    that intersect, found with a uniform grid, so the running time scales with the number of overlapping boxes.
+    If `labels` are given, boxes suppress only boxes with the same label. By default the overlap is relative to the
+    area of the suppressed box, and IoU is used instead if `iou` is True"""
 
     # if there are no boxes, return an empty list
     if len(boxes) == 0:
@@ -24,121 +239,544 @@ def non_max_suppression_fast(
     if boxes.dtype.kind == "i":
         boxes = boxes.astype("float")
 
-    # sort prediction by scores,
+    # compute the area of the bounding boxes and sort them
+    order = _sort_order(scores, _box_area(boxes), sort_criterion)
 
-    # initialize the list of picked indexes
-    pick = []
+    # return indices for selected bounding boxes
+    labels = None if labels is None else np.asarray(labels)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return _greedy_suppress(
+        order, *_box_edges(boxes, overlap_thresh, labels, iou, rank=rank)
+    )
 
-    # grab the coordinates of the bounding boxes
-    x1 = boxes[:, 0]
-    y1 = boxes[:, 1]
-    x2 = boxes[:, 2]
-    y2 = boxes[:, 3]
-
-    # compute the area of the bounding boxes and sort the bounding
-    # boxes by the bottom-right y-coordinate of the bounding box
-    area = (x2 - x1 + 1) * (y2 - y1 + 1)
-    if sort_criterion == "score":
-        idxs = np.argsort(scores)
-    elif sort_criterion == "area":
-        idxs = np.argsort(area)
-    else:
-        print('Unknown sort criteria, reverting to "score"')
-        idxs = np.argsort(scores)
+# %% ../../nbs/14_data.postprocessing.ipynb 10
+def benchmark_nms(
+    sizes: list = [10**4, 10**5, 10**6, 10**7],
+    overlap_thresh: float = 0.7,
+    detections_per_object: int = 3,
+    box_size: float = 20.0,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Run `non_max_suppression_fast` for synthetic scenes with each number of boxes in `sizes`, and report the running time
+    and throughput. Each object has `detections_per_object` jittered boxes of around `box_size` units, and the objects are spread
+    with constant density so that the number of overlapping boxes grows linearly with the size of the scene
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        n_objects = max(1, n // detections_per_object)
+        side = np.sqrt(n_objects) * 2 * box_size
+        centers = np.repeat(
+            rng.uniform(0, side, (n_objects, 2)), detections_per_object, axis=0
+        )[:n]
+        centers += rng.normal(0, box_size / 10, centers.shape)
+        halves = rng.uniform(0.4, 0.6, centers.shape) * box_size
+        boxes = np.hstack((centers - halves, centers + halves))
+        scores = rng.uniform(size=len(boxes))
+        start = time.perf_counter()
+        pick = non_max_suppression_fast(boxes, scores, overlap_thresh)
+        elapsed = time.perf_counter() - start
+        results.append(
+            {
+                "n_boxes": len(boxes),
+                "n_kept": len(pick),
+                "seconds": elapsed,
+                "boxes_per_s": len(boxes) / elapsed,
+            }
+        )
+    return pd.DataFrame(results)
 
-    # keep looping while some indexes still remain in the indexes
-    # list
-    while len(idxs) > 0:
-        # grab the last index in the indexes list and add the
-        # index value to the list of picked indexes
-        last = len(idxs) - 1
-        i = idxs[last]
+# %% ../../nbs/14_data.postprocessing.ipynb 14
+def soft_nms(
+    boxes,
+    scores,
+    iou_thresh: float = 0.3,
+    sigma: float = 0.5,
+    method: str = "gaussian",
+    score_thresh: float = 0.001,
+    labels=None,
+):
+    """Soft non-max suppression (Bodla et al.) that decays the scores of the boxes overlapping a picked box instead of removing them.
+    With `method='gaussian'` the scores are multiplied by `exp(-iou**2/sigma)`, and with `method='linear'` by `1-iou` if IoU is larger
+    than `iou_thresh`. Boxes are dropped when their score falls below `score_thresh`. Only the boxes that intersect are compared,
+    and if `labels` are given, only the boxes with the same label. Returns the indices of the kept boxes and their decayed scores
+    """
+    if method not in ["gaussian", "linear"]:
+        raise Exception(
+            f"Unknown method {method}, must be either `gaussian` or `linear`"
+        )
+    if len(boxes) == 0:
+        return [], np.zeros(0)
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
+    labels = None if labels is None else np.asarray(labels)
+    src, dst, ious = _box_edges(
+        boxes,
+        iou_thresh if method == "linear" else 0,
+        labels,
+        iou=True,
+        with_overlaps=True,
+    )
+    decay = 1 - ious if method == "linear" else np.exp(-(ious**2) / sigma)
+    srt = np.argsort(src, kind="stable")
+    src, dst, decay = src[srt], dst[srt], decay[srt]
+    starts, ends = np.searchsorted(src, np.arange(len(boxes))), np.searchsorted(
+        src, np.arange(len(boxes)), "right"
+    )
+    scores = np.array(scores, dtype=float)
+    # heap of the current scores, where outdated entries are skipped
+    heap = [(-s, i) for i, s in enumerate(scores.tolist())]
+    heapq.heapify(heap)
+    done = np.zeros(len(boxes), dtype=bool)
+    pick = []
+    while heap:
+        s, i = heapq.heappop(heap)
+        if done[i] or -s != scores[i]:
+            continue
+        if -s < score_thresh:
+            break
+        done[i] = True
         pick.append(i)
+        nbrs, d = dst[starts[i] : ends[i]], decay[starts[i] : ends[i]]
+        nbrs, d = nbrs[~done[nbrs]], d[~done[nbrs]]
+        scores[nbrs] *= d
+        for j, s in zip(nbrs.tolist(), scores[nbrs].tolist()):
+            heapq.heappush(heap, (-s, j))
+    return pick, scores[pick]
 
-        # find the largest (x, y) coordinates for the start of
-        # the bounding box and the smallest (x, y) coordinates
-        # for the end of the bounding box
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x2[i], x2[idxs[:last]])
-        yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-        # compute the width and height of the bounding box
-        w = np.maximum(0, xx2 - xx1 + 1)
-        h = np.maximum(0, yy2 - yy1 + 1)
-
-        # compute the ratio of overlap
-        overlap = (w * h) / area[idxs[:last]]
+# %% ../../nbs/14_data.postprocessing.ipynb 15
+def weighted_boxes_fusion(
+    boxes,
+    scores,
+    iou_thresh: float = 0.55,
+    n_models: int = 1,
+    labels=None,
+    skip_thresh: float = 0.0,
+):
+    """Weighted boxes fusion (Solovyev et al.) for the predictions of `n_models` models or augmentations. Boxes are visited from the
+    highest score to the lowest, and each box is added to the cluster whose fused box has the highest IoU with it, if that is larger
+    than `iou_thresh`, or starts a new cluster. The fused boxes are the score-weighted averages of their clusters, and the fused scores
+    are the mean scores scaled by `min(n_boxes, n_models)/n_models`. Fused boxes are kept in a uniform grid, so each box is compared
+    only with the fused boxes in the cells it spans. Boxes with score below `skip_thresh` are ignored.
+    Returns the fused boxes and scores, and the index of the cluster of each box, or -1 for the ignored boxes
+    """
+    boxes, scores = np.asarray(boxes, dtype=float), np.asarray(scores, dtype=float)
+    clusters = np.full(len(boxes), -1, dtype=np.int64)
+    if len(boxes) == 0:
+        return np.zeros((0, 4)), np.zeros(0), clusters
+    labels = (
+        np.zeros(len(boxes), dtype=np.int64) if labels is None else np.asarray(labels)
+    )
+    # cells are as large as most of the boxes, and fused boxes are added to every cell they span. Fused boxes spanning
+    # more than `max_span` cells are compared with every box, and boxes spanning more than that with every fused box
+    max_span = 64
+    size = max(np.percentile((boxes[:, 2:] - boxes[:, :2] + 1).max(axis=1), 90), 1e-9)
+    ox, oy = boxes[:, :2].min(axis=0).tolist()
 
-        # delete all indexes from the index list that have
-        idxs = np.delete(
-            idxs, np.concatenate(([last], np.where(overlap > overlap_thresh)[0]))
+    def _cells(b):
+        cx0, cy0, cx1, cy1 = (
+            int((b[0] - ox) // size),
+            int((b[1] - oy) // size),
+            int((b[2] + 1 - ox) // size),
+            int((b[3] + 1 - oy) // size),
         )
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > max_span:
+            return None
+        return list(itertools.product(range(cx0, cx1 + 1), range(cy0, cy1 + 1)))
 
-    # return indices for selected bounding boxes
-    return pick
-    # return boxes[pick].astype("int")
+    weighted, wsum = np.zeros((len(boxes), 4)), np.zeros(len(boxes))
+    fused, fused_labels, count = (
+        np.zeros((len(boxes), 4)),
+        labels.copy(),
+        np.zeros(len(boxes), dtype=np.int64),
+    )
+    grid, wide, n = {}, set(), 0
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] < skip_thresh:
+            break
+        b = boxes[i]
+        cells = _cells(b.tolist())
+        if cells is None:
+            cands = np.arange(n)
+        else:
+            cands = np.array(
+                sorted(wide.union(*(grid.get(c, ()) for c in cells))), dtype=np.int64
+            )
+        cands = cands[fused_labels[cands] == labels[i]]
+        k = -1
+        if len(cands):
+            f = fused[cands]
+            w = np.maximum(0, np.minimum(b[2], f[:, 2]) - np.maximum(b[0], f[:, 0]) + 1)
+            h = np.maximum(0, np.minimum(b[3], f[:, 3]) - np.maximum(b[1], f[:, 1]) + 1)
+            ious = (
+                w
+                * h
+                / (
+                    (b[2] - b[0] + 1) * (b[3] - b[1] + 1)
+                    + (f[:, 2] - f[:, 0] + 1) * (f[:, 3] - f[:, 1] + 1)
+                    - w * h
+                )
+            )
+            if ious.max() > iou_thresh:
+                k = cands[np.argmax(ious)]
+        if k < 0:
+            k, n = n, n + 1
+            fused_labels[k] = labels[i]
+        else:
+            cells = _cells(fused[k].tolist())
+            if cells is None:
+                wide.discard(k)
+            else:
+                for c in cells:
+                    grid[c].discard(k)
+        weighted[k] += scores[i] * b
+        wsum[k] += scores[i]
+        count[k] += 1
+        fused[k] = weighted[k] / wsum[k] if wsum[k] > 0 else b
+        cells = _cells(fused[k].tolist())
+        if cells is None:
+            wide.add(k)
+        else:
+            for c in cells:
+                grid.setdefault(c, set()).add(k)
+        clusters[i] = k
+    fused_scores = wsum[:n] / count[:n] * np.minimum(count[:n], n_models) / n_models
+    return fused[:n], fused_scores, clusters
 
-# %% ../../nbs/14_data.postprocessing.ipynb 8
+# %% ../../nbs/14_data.postprocessing.ipynb 18
 def poly_IoU(poly_1: Polygon, poly_2: Polygon) -> float:
     "Calculate IoU for two shapely Polygons"
     area_intersection = poly_1.intersection(poly_2).area
-    area_union = poly_1.union(poly_2).area
+    area_union = poly_1.area + poly_2.area - area_intersection
     iou = area_intersection / area_union
     return iou
 
-# %% ../../nbs/14_data.postprocessing.ipynb 9
+# %% ../../nbs/14_data.postprocessing.ipynb 19
 def non_max_suppression_poly(
-    geoms, scores, overlap_thresh: float, sort_criterion: str = "score"
+    geoms, scores, overlap_thresh: float, sort_criterion: str = "score", labels=None
 ):
-    "Do non-max suppression for shapely Polygons in `geoms`. Can be sorted according to `area` or `score`"
+    """Do non-max suppression for shapely Polygons in `geoms`. Can be sorted according to `area` or `score`.
+    IoUs are computed only for the polygons that intersect, found with an STRtree. If `labels` are given,
+    polygons suppress only polygons with the same label"""
 
     # if there are no geoms, return an empty list
     if len(geoms) == 0:
         return []
 
-    # sort prediction by scores,
+    # compute the area of the geoms and sort them
+    geoms = np.asarray(geoms, dtype=object)
+    order = _sort_order(scores, shapely.area(geoms), sort_criterion)
 
-    # initialize the list of picked indexes
-    pick = []
+    # return indices for selected geoms
+    labels = None if labels is None else np.asarray(labels)
+    return _greedy_suppress(order, *_poly_edges(geoms, overlap_thresh, labels))
 
-    # compute the area of the bounding geoms and sort the bounding
-    # geoms by the bottom-right y-coordinate of the bounding box
-    area = np.array([geom.area for geom in geoms])
-    if sort_criterion == "score":
-        idxs = np.argsort(scores)
-    elif sort_criterion == "area":
-        idxs = np.argsort(area)
-    else:
-        print('Unknown sort criteria, reverting to "score"')
-        idxs = np.argsort(scores)
+# %% ../../nbs/14_data.postprocessing.ipynb 22
+def do_nms(
+    gdf: gpd.GeoDataFrame,
+    nms_thresh=0.7,
+    crit="score",
+    label_col: str = None,
+    iou: bool = False,
+) -> gpd.GeoDataFrame:
+    """Perform non-max suppression for bounding boxes using `nms_threshold` to `gdf`. If `label_col` is given,
+    the classes are suppressed separately in the same call. Overlap is measured with IoU if `iou` is True
+    """
+    gdf = gdf.copy()
+    np_bboxes = gdf.bounds.values
+    scores = gdf.score.values
+    labels = None if label_col is None else gdf[label_col].values
+    idxs = non_max_suppression_fast(np_bboxes, scores, nms_thresh, crit, labels, iou)
+    gdf = gdf.iloc[idxs]
+    return gdf
+
+# %% ../../nbs/14_data.postprocessing.ipynb 28
+def _tile_nms(
+    idxs, shapes, rank, border, keys, overlap_thresh: float, poly: bool, iou: bool
+):
+    """Run non-max suppression for a batch of cells at once, pairing only the detections with the same `keys` of cell and label.
+    Returns the picks from the groups of overlapping detections that do not contain any `border` detections, and the detections
+    of the other groups that are left to the second pass"""
+    src, dst = (
+        _poly_edges(shapes, overlap_thresh, keys)
+        if poly
+        else _box_edges(shapes, overlap_thresh, keys, iou)
+    )
+    comps = _components(len(idxs), src, dst)
+    deferred = np.isin(comps, comps[border])
+    picks = np.array(_greedy_suppress(np.argsort(rank), src, dst), dtype=np.int64)
+    return idxs[picks[~deferred[picks]]], idxs[deferred]
 
-    # keep looping while some indexes still remain in the indexes
-    # list
-    while len(idxs) > 0:
-        # grab the last index in the indexes list and add the
-        # index value to the list of picked indexes
-        last = len(idxs) - 1
-        i = idxs[last]
-        pick.append(i)
 
-        # compute the ratio of overlap with all other polygons
-        overlap = np.array([poly_IoU(geoms[i], geoms[k]) for k in idxs[:last]])
-        # delete all indexes from the index list that have
-        # overlap larger than overlap_thresh
-        idxs = np.delete(
-            idxs, np.concatenate(([last], np.where(overlap > overlap_thresh)[0]))
+def _tiled_first_pass(
+    gdf,
+    grid,
+    shapes,
+    rank,
+    labels,
+    nms_thresh: float,
+    cell_col: str,
+    poly: bool,
+    n_workers: int,
+    iou: bool,
+):
+    "Resolve the detections that do not interact with other cells in batches of cells in `n_workers` processes"
+    own = (
+        gdf[cell_col]
+        .map({c: i for i, c in enumerate(grid.cell)})
+        .fillna(-1)
+        .values.astype(np.int64)
+    )
+    if poly:
+        footprints, cells = shapes, grid.geometry.values
+        outside = np.ones(len(gdf), dtype=bool)
+        outside[own >= 0] = ~shapely.covered_by(
+            footprints[own >= 0], cells[own[own >= 0]]
+        )
+    else:
+        # boxes are inclusive of their last pixel, so they and the cells are extended by 1
+        footprints = shapely.box(
+            shapes[:, 0], shapes[:, 1], shapes[:, 2] + 1, shapes[:, 3] + 1
+        )
+        cell_bounds = grid.bounds.values
+        cells = shapely.box(
+            cell_bounds[:, 0],
+            cell_bounds[:, 1],
+            cell_bounds[:, 2] + 1,
+            cell_bounds[:, 3] + 1,
         )
+        own_bounds = np.where(own[:, None] >= 0, cell_bounds[own], np.nan)
+        outside = ~(
+            (shapes[:, :2] >= own_bounds[:, :2]).all(axis=1)
+            & (shapes[:, 2:] <= own_bounds[:, 2:]).all(axis=1)
+        )
+    # detections that intersect other cells than their own or that are not within their own cell
+    det_idx, cell_idx = shapely.STRtree(cells).query(footprints, predicate="intersects")
+    border = outside.copy()
+    border[det_idx[cell_idx != own[det_idx]]] = True
+    # and detections that intersect the detections that are not within their own cell
+    if outside.any():
+        border[
+            shapely.STRtree(footprints[outside]).query(
+                footprints, predicate="intersects"
+            )[0]
+        ] = True
+    # a few batches of whole cells for each worker, each with a single pair search over its detections
+    keys = own * (labels.max() + 1) + labels
+    by_cell = np.flatnonzero(own >= 0)
+    by_cell = by_cell[np.argsort(own[by_cell], kind="stable")]
+    n_batches = min(4 * n_workers, len(by_cell))
+    bounds = np.searchsorted(
+        own[by_cell],
+        np.quantile(own[by_cell], np.linspace(0, 1, n_batches + 1)[1:-1]),
+        "right",
+    )
+    batches = [b for b in np.split(by_cell, bounds) if len(b)]
+    with ProcessPoolExecutor(max_workers=n_workers) as ex:
+        results = list(
+            ex.map(
+                _tile_nms,
+                batches,
+                [shapes[idxs] for idxs in batches],
+                [rank[idxs] for idxs in batches],
+                [border[idxs] for idxs in batches],
+                [keys[idxs] for idxs in batches],
+                itertools.repeat(nms_thresh),
+                itertools.repeat(poly),
+                itertools.repeat(iou),
+            )
+        )
+    return [np.zeros(0, dtype=np.int64)] + [r[0] for r in results], np.concatenate(
+        [np.flatnonzero(own < 0)] + [r[1] for r in results]
+    )
 
-    # return indices for selected bounding geoms
-    return pick
 
-# %% ../../nbs/14_data.postprocessing.ipynb 11
-def do_nms(gdf: gpd.GeoDataFrame, nms_thresh=0.7, crit="score") -> gpd.GeoDataFrame:
-    "Perform non-max suppression for bounding boxes using `nms_threshold` to `gdf`"
-    gdf = gdf.copy()
-    np_bboxes = np.array([b.bounds for b in gdf.geometry])
-    scores = gdf.score.values
-    idxs = non_max_suppression_fast(np_bboxes, scores, nms_thresh, crit)
-    gdf = gdf.iloc[idxs]
+def do_tiled_nms(
+    gdf: gpd.GeoDataFrame,
+    grid: gpd.GeoDataFrame,
+    nms_thresh=0.7,
+    crit="score",
+    cell_col: str = "cell",
+    poly: bool = False,
+    n_workers: int = 1,
+    label_col: str = None,
+    iou: bool = False,
+) -> gpd.GeoDataFrame:
+    """Perform non-max suppression using `nms_threshold` to `gdf` that contains the predictions for the cells of `grid`, such as `Tiler.grid`.
+    The cell of each prediction is in column `cell_col`. Bounding boxes are used by default, and polygons with IoU if `poly` is True.
+    `label_col` and `iou` work as in `do_nms`.
+
+    Detections within their own cells can overlap detections of other cells only if they intersect the other cell, so the
+    groups of overlapping detections that do not intersect other cells or detections extending outside their own cells are
+    resolved within their cells, in batches of cells split between `n_workers` processes. The rest are resolved in a second pass,
+    and the result is the same as with global non-max suppression. With a single worker all detections are resolved in one pass,
+    as splitting the work pays off only when the cells are processed in parallel.
+    """
+    if len(gdf) == 0:
+        return gdf.copy()
+    shapes = (
+        np.asarray(gdf.geometry.values, dtype=object) if poly else gdf.bounds.values
+    )
+    area = shapely.area(shapes) if poly else _box_area(shapes)
+    labels = (
+        np.zeros(len(gdf), dtype=np.int64)
+        if label_col is None
+        else pd.factorize(gdf[label_col], use_na_sentinel=False)[0]
+    )
+    order = _sort_order(gdf.score.values, area, crit)
+    rank = np.empty(len(gdf), dtype=np.int64)
+    rank[order] = np.arange(len(gdf))
+    picks, deferred = [np.zeros(0, dtype=np.int64)], np.arange(len(gdf))
+    # a single worker is faster with one pass over all detections
+    if n_workers > 1:
+        picks, deferred = _tiled_first_pass(
+            gdf, grid, shapes, rank, labels, nms_thresh, cell_col, poly, n_workers, iou
+        )
+    if len(deferred) > 0:
+        src, dst = (
+            _poly_edges(shapes[deferred], nms_thresh, labels[deferred])
+            if poly
+            else _box_edges(shapes[deferred], nms_thresh, labels[deferred], iou)
+        )
+        picks.append(
+            deferred[
+                np.array(
+                    _greedy_suppress(np.argsort(rank[deferred]), src, dst),
+                    dtype=np.int64,
+                )
+            ]
+        )
+    picks = np.concatenate(picks)
+    return gdf.iloc[picks[np.argsort(rank[picks])]]
+
+# %% ../../nbs/14_data.postprocessing.ipynb 31
+def do_soft_nms(
+    gdf: gpd.GeoDataFrame,
+    iou_thresh=0.3,
+    sigma=0.5,
+    method="gaussian",
+    score_thresh=0.001,
+    label_col: str = None,
+) -> gpd.GeoDataFrame:
+    "Perform soft non-max suppression for bounding boxes to `gdf`. The kept rows have their decayed scores in `score`"
+    labels = None if label_col is None else gdf[label_col].values
+    idxs, scores = soft_nms(
+        gdf.bounds.values,
+        gdf.score.values,
+        iou_thresh,
+        sigma,
+        method,
+        score_thresh,
+        labels,
+    )
+    gdf = gdf.iloc[idxs].copy()
+    gdf["score"] = scores
     return gdf
+
+
+def do_wbf(
+    gdf: gpd.GeoDataFrame,
+    iou_thresh=0.55,
+    n_models: int = 1,
+    label_col: str = None,
+    skip_thresh=0.0,
+) -> gpd.GeoDataFrame:
+    """Fuse the bounding boxes of `gdf`, containing the predictions of `n_models` models or augmentations, with weighted boxes fusion.
+    The result has the fused boxes, their scores, labels if `label_col` is given and the number of fused boxes in `n_boxes`
+    """
+    labels = None if label_col is None else gdf[label_col].values
+    boxes, scores, clusters = weighted_boxes_fusion(
+        gdf.bounds.values, gdf.score.values, iou_thresh, n_models, labels, skip_thresh
+    )
+    fused = gpd.GeoDataFrame(
+        {
+            "score": scores,
+            "n_boxes": np.bincount(clusters[clusters >= 0], minlength=len(boxes)),
+        },
+        geometry=shapely.box(*boxes.T),
+        crs=gdf.crs,
+    )
+    if label_col is not None:
+        first = (
+            pd.Series(np.arange(len(gdf)))[clusters >= 0]
+            .groupby(clusters[clusters >= 0])
+            .first()
+        )
+        fused.insert(0, label_col, gdf[label_col].values[first.values])
+    return fused
+
+# %% ../../nbs/14_data.postprocessing.ipynb 34
+def _union_groups(geoms: list) -> list:
+    "Union the geometries of each group in `geoms`"
+    return [shapely.union_all(g) for g in geoms]
+
+
+def merge_split_instances(
+    gdf: gpd.GeoDataFrame,
+    grid: gpd.GeoDataFrame,
+    cell_col: str = "cell",
+    label_col: str = None,
+    score_agg: str = "max",
+    tolerance: float = 0.0,
+    n_workers: int = 1,
+) -> gpd.GeoDataFrame:
+    """Merge the instances of `gdf` that are split across the boundaries of the cells of `grid`, such as `Tiler.grid`. The cell of each
+    instance is in column `cell_col`. Parts that are within `tolerance` of the boundary of their own cell are grouped with the parts
+    from other cells that are within `tolerance` of them and have the same label in `label_col` if given, and the groups are unioned in `n_workers` processes. The merged instances
+    get the other attributes from their part with the highest score, and either the `max` or the `mean` of the scores of the parts.
+    """
+    if score_agg not in ["max", "mean"]:
+        raise Exception("Unknown score aggregation, must be either `max` or `mean`")
+    if len(gdf) == 0:
+        return gdf.copy()
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    own = (
+        gdf[cell_col]
+        .map({c: i for i, c in enumerate(grid.cell)})
+        .fillna(-1)
+        .values.astype(np.int64)
+    )
+    # parts that touch the boundary of their own cell
+    edge = np.zeros(len(gdf), dtype=bool)
+    edge[own >= 0] = shapely.dwithin(
+        geoms[own >= 0],
+        shapely.boundary(grid.geometry.values[own[own >= 0]]),
+        tolerance,
+    )
+    cands = np.flatnonzero(edge)
+    # and the parts of other cells that are within `tolerance` of them
+    src, dst = shapely.STRtree(geoms).query(
+        geoms[cands], predicate="dwithin", distance=tolerance
+    )
+    src = cands[src]
+    pair = (own[dst] >= 0) & (own[src] != own[dst])
+    if label_col is not None:
+        pair &= gdf[label_col].values[src] == gdf[label_col].values[dst]
+    comps = _components(len(gdf), src[pair], dst[pair])
+    split = np.bincount(comps, minlength=len(gdf))[comps] > 1
+    parts = np.flatnonzero(split)
+    groups = [parts[g] for g in pd.Series(parts).groupby(comps[parts]).indices.values()]
+    scores = gdf.score.values if "score" in gdf.columns else np.zeros(len(gdf))
+    heads = np.array([g[np.argmax(scores[g])] for g in groups], dtype=np.int64)
+    chunks = [
+        [geoms[g] for g in groups[i :: max(n_workers, 1) * 4]]
+        for i in range(max(n_workers, 1) * 4)
+    ]
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            unions = list(ex.map(_union_groups, chunks))
+    else:
+        unions = list(map(_union_groups, chunks))
+    merged = np.empty(len(groups), dtype=object)
+    for i, u in enumerate(unions):
+        merged[i :: len(chunks)] = u
+    res = gdf.copy()
+    res.iloc[heads, res.columns.get_loc(res.geometry.name)] = merged
+    if "score" in gdf.columns:
+        res.iloc[heads, res.columns.get_loc("score")] = [
+            scores[g].max() if score_agg == "max" else scores[g].mean() for g in groups
+        ]
+    keep = ~split
+    keep[heads] = True
+    return res[keep]
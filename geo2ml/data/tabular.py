@@ -1,7 +1,8 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/10_data.tabular.ipynb.
 
 # %% auto 0
-__all__ = ['array_to_longform', 'drop_small_classes', 'sample_raster_with_points', 'sample_raster_with_polygons']
+__all__ = ['array_to_longform', 'drop_small_classes', 'vector_crs', 'read_vector', 'write_vector', 'sample_raster_with_points',
+           'sample_raster_with_polygons']
 
 # %% ../../nbs/10_data.tabular.ipynb 3
 from fastcore.basics import *
@@ -10,6 +11,11 @@ import pandas as pd
 import numpy as np
 import geopandas as gpd
 import logging
+import json
+import pyogrio
+import pyarrow.parquet as pq
+from pyproj import CRS, Transformer
+from shapely.geometry import box
 from rasterstats import zonal_stats
 from pathlib import Path
 
@@ -39,7 +45,98 @@ def drop_small_classes(
     logging.info(drop_classes)
     return df.loc[drop_series, :]
 
-# %% ../../nbs/10_data.tabular.ipynb 17
+# %% ../../nbs/10_data.tabular.ipynb 16
+def _vector_meta(path: Path) -> tuple:
+    "Get the GeoParquet metadata of the primary geometry column and its name"
+    geo = json.loads(pq.read_schema(path).metadata[b"geo"])
+    return geo["columns"][geo["primary_column"]], geo["primary_column"]
+
+
+def vector_crs(path: Path | str, layer: str = None) -> CRS:
+    "Get the crs of vector data in `path` without reading the features"
+    if Path(path).suffix == ".parquet":
+        crs = _vector_meta(path)[0].get(
+            "crs", "OGC:CRS84"
+        )  # GeoParquet defaults to lon/lat
+    else:
+        crs = pyogrio.read_info(path, layer=layer)["crs"]
+    return CRS.from_user_input(crs) if crs is not None else None
+
+
+def read_vector(
+    path: Path | str,
+    layer: str = None,
+    columns: list = None,
+    bbox: tuple = None,
+    bbox_crs=None,
+    read_geometry: bool = True,
+) -> gpd.GeoDataFrame:
+    """Read vector data from `path` with `pyogrio` and Arrow, or from GeoParquet if `path` ends with `.parquet`.
+    If `columns` is given, only these attributes are read in addition to the geometries. If `bbox` is given,
+    only the features whose bounding boxes intersect with it are read. `bbox` is in the crs of the data, unless `bbox_crs` is specified.
+    If `read_geometry` is False, only the attributes of all features are read into a `pd.DataFrame`, without decoding the geometries.
+    """
+    path = Path(path)
+    if not read_geometry:
+        if bbox is not None:
+            raise Exception("`bbox` requires reading the geometries")
+        if path.suffix == ".parquet":
+            return pq.read_table(path, columns=columns).to_pandas()
+        return pyogrio.read_dataframe(
+            path, layer=layer, columns=columns, read_geometry=False, use_arrow=True
+        )
+    if bbox is not None:
+        bbox = tuple(float(b) for b in bbox)
+    if bbox is not None and bbox_crs is not None:
+        crs = vector_crs(path, layer)
+        if crs is not None:
+            bbox = Transformer.from_crs(
+                CRS.from_user_input(bbox_crs), crs, always_xy=True
+            ).transform_bounds(*bbox, densify_pts=21)
+    if path.suffix != ".parquet":
+        return gpd.read_file(
+            path,
+            layer=layer,
+            columns=columns,
+            bbox=bbox,
+            engine="pyogrio",
+            use_arrow=True,
+        )
+    meta, geom_col = _vector_meta(path)
+    if columns is not None:
+        columns = [c for c in columns if c != geom_col] + [geom_col]
+    if bbox is None or "covering" in meta:
+        return gpd.read_parquet(path, columns=columns, bbox=bbox)
+    gdf = gpd.read_parquet(
+        path, columns=columns
+    )  # no covering column to filter with, so filter after reading
+    return gdf.iloc[np.sort(gdf.sindex.query(box(*bbox)))].reset_index(drop=True)
+
+
+def _raster_bounds(src) -> tuple:
+    "Get the bounds of opened raster `src`, also for rasters georeferenced with GCPs"
+    if src.gcps[1]:
+        xs, ys = rio.transform.xy(
+            rio.transform.from_gcps(src.gcps[0]),
+            [0, 0, src.height, src.height],
+            [0, src.width, 0, src.width],
+            offset="ul",
+        )
+        return min(xs), min(ys), max(xs), max(ys)
+    return tuple(src.bounds)
+
+
+def write_vector(gdf: gpd.GeoDataFrame, path: Path | str, layer: str = None, **kwargs):
+    """Write `gdf` into `path` as GeoParquet with bounding box covering column if `path` ends with `.parquet`,
+    otherwise with `pyogrio` and Arrow, inferring the driver from the suffix of `path`.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        gdf.to_parquet(path, write_covering_bbox=True, **kwargs)
+    else:
+        gdf.to_file(path, layer=layer, engine="pyogrio", use_arrow=True, **kwargs)
+
+# %% ../../nbs/10_data.tabular.ipynb 22
 def sample_raster_with_points(
     sampling_locations: Path,
     input_raster: Path,
@@ -47,19 +144,27 @@ def sample_raster_with_points(
     gpkg_layer: str = None,
     band_names: list[str] = None,
     rename_target: str = None,
+    within_raster: bool = False,
 ) -> gpd.GeoDataFrame:
-    "Extract values from `input_raster` using points from `sampling_locations`. Returns a `gpd.GeoDataFrame` with columns `target_column`, `geometry` and bands"
+    """Extract values from `input_raster` using points from `sampling_locations`. Returns a `gpd.GeoDataFrame` with columns `target_column`, `geometry` and bands.
+    Only `target_column` is read from `sampling_locations`, and if `within_raster` is True, only the points within the bounds of `input_raster`.
+    """
 
     if str(sampling_locations).endswith("gpkg") and not gpkg_layer:
         raise Exception("`sampling_locations` is .gpkg but no `gpkg_layer` specified")
 
-    gdf = gpd.read_file(sampling_locations, layer=gpkg_layer)
-
     with rio.open(input_raster) as src:
         if src.gcps[1]:
             in_crs = src.gcps[1]
         else:
             in_crs = src.crs
+        gdf = read_vector(
+            sampling_locations,
+            layer=gpkg_layer,
+            columns=[target_column],
+            bbox=_raster_bounds(src) if within_raster else None,
+            bbox_crs=in_crs,
+        )
         gdf = gdf.to_crs(in_crs)
         coords = [(x, y) for x, y in zip(gdf.geometry.x, gdf.geometry.y)]
         values = np.array([p for p in src.sample(coords)])
@@ -88,7 +193,7 @@ def sample_raster_with_points(
         out_gdf[b] = values[:, i].astype(prof["dtype"])
     return out_gdf
 
-# %% ../../nbs/10_data.tabular.ipynb 25
+# %% ../../nbs/10_data.tabular.ipynb 30
 def sample_raster_with_polygons(
     sampling_locations: Path,
     input_raster: Path,
@@ -98,18 +203,27 @@ def sample_raster_with_polygons(
     rename_target: str = None,
     stats: list[str] = ["min", "max", "mean", "count"],
     categorical: bool = False,
+    within_raster: bool = False,
 ) -> gpd.GeoDataFrame:
-    "Extract values from `input_raster` using polygons from `sampling_locations` with `rasterstats.zonal_stats` for all bands"
+    """Extract values from `input_raster` using polygons from `sampling_locations` with `rasterstats.zonal_stats` for all bands.
+    Only `target_column` is read from `sampling_locations`, and if `within_raster` is True, only the polygons intersecting the bounds of `input_raster`.
+    """
 
     if str(sampling_locations).endswith("gpkg") and not gpkg_layer:
         raise Exception("`sampling_locations` is .gpkg but no `gpkg_layer` specified")
 
-    gdf = gpd.read_file(sampling_locations, layer=gpkg_layer)
     with rio.open(input_raster) as src:
         if src.gcps[1]:
             in_crs = src.gcps[1]
         else:
             in_crs = src.crs
+        gdf = read_vector(
+            sampling_locations,
+            layer=gpkg_layer,
+            columns=[target_column] if target_column else None,
+            bbox=_raster_bounds(src) if within_raster else None,
+            bbox_crs=in_crs,
+        )
         gdf = gdf.to_crs(in_crs)
         n_bands = src.count
         prof = src.profile
@@ -1,26 +1,38 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/12_data.tiling.ipynb.
 
 # %% auto 0
-__all__ = ['Tiler', 'untile_raster', 'copy_sum', 'untile_vector']
+__all__ = ['BlockCache', 'RasterMosaic', 'open_raster', 'Tiler', 'benchmark_codecs', 'ChipStore', 'blending_window',
+           'untile_raster', 'copy_sum', 'untile_vector']
 
 # %% ../../nbs/12_data.tiling.ipynb 4
 import rasterio as rio
 import numpy as np
 import itertools
+from collections import OrderedDict
 import pandas as pd
 import geopandas as gpd
 from fastcore.basics import *
 import os
+import json
+import time
+import tempfile
+import hashlib
 from pathlib import Path
 from tqdm.auto import tqdm
 import shapely
 from shapely.geometry import box
 import rasterio.mask as rio_mask
 import rasterio.windows as rio_windows
+import rasterio.features as rio_features
+from rasterio.enums import MaskFlags
+from rasterio.io import MemoryFile
+import rasterio.shutil as rio_shutil
 import fiona
-from rasterio.merge import merge as rio_merge
+from rasterio.merge import MERGE_METHODS
 from sklearn.preprocessing import LabelEncoder
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from .postproc import *
+from .tabular import read_vector, write_vector
 
 # %% ../../nbs/12_data.tiling.ipynb 12
 def fix_multipolys(multipoly: shapely.geometry.MultiPolygon):
@@ -37,6 +49,849 @@ def fix_multipolys(multipoly: shapely.geometry.MultiPolygon):
     return shapely.geometry.Polygon(temp_poly.exterior)
 
 # %% ../../nbs/12_data.tiling.ipynb 13
+def _clip_to_cells(
+    vector: gpd.GeoDataFrame, cells: np.ndarray, min_area_pct: float = 0.0
+) -> tuple:
+    """Clip the polygons in `vector` to all polygons in `cells` at once. Keeps the clipped polygons that cover at least `min_area_pct` of
+    the original polygon, and converts them to single polygons without holes like `fix_multipolys`. The results are the same as when using
+    `GeoDataFrame.clip` with `keep_geom_type=True` for each cell separately. Returns the index of the cell for each clipped polygon, sorted,
+    and a GeoDataFrame of the clipped polygons with the original area in column `orig_area`
+    """
+    geometries = np.asarray(vector.geometry)
+    cell_idx, geom_idx = vector.sindex.query(cells, predicate="intersects")
+    order = np.lexsort((geom_idx, cell_idx))
+    cell_idx, geom_idx = cell_idx[order], geom_idx[order]
+    # Polygons that are completely inside the cell are not changed by the intersection
+    shapely.prepare(cells)
+    inside = shapely.contains_properly(cells[cell_idx], geometries[geom_idx])
+    clipped = geometries[geom_idx].copy()
+    clipped[~inside] = shapely.intersection(clipped[~inside], cells[cell_idx[~inside]])
+    # `GeoDataFrame.clip` explodes all multipart geometries of a cell if any of the intersections is a GeometryCollection
+    explode = np.isin(cell_idx, cell_idx[shapely.get_type_id(clipped) == 7])
+    parts, part_idx = shapely.get_parts(clipped[explode], return_index=True)
+    idx = np.concatenate([np.flatnonzero(~explode), np.flatnonzero(explode)[part_idx]])
+    geoms = np.concatenate([clipped[~explode], parts])
+    order = np.argsort(idx, kind="stable")
+    idx, geoms = idx[order], geoms[order]
+    # Only (multi)polygons are kept, and only if they are large enough
+    orig_area = shapely.area(geometries)[geom_idx[idx]]
+    keep = np.isin(shapely.get_type_id(geoms), [3, 6]) & (
+        shapely.area(geoms) >= orig_area * min_area_pct
+    )
+    idx, geoms, orig_area = idx[keep], geoms[keep], orig_area[keep]
+    # MultiPolygons are replaced with their first largest part
+    multi = np.flatnonzero(shapely.get_type_id(geoms) == 6)
+    if len(multi) > 0:
+        parts, part_idx = shapely.get_parts(geoms[multi], return_index=True)
+        order = np.lexsort((np.arange(len(parts)), -shapely.area(parts), part_idx))
+        first = order[np.r_[True, part_idx[order][1:] != part_idx[order][:-1]]]
+        geoms[multi[part_idx[first]]] = parts[first]
+    geoms = shapely.polygons(shapely.get_exterior_ring(geoms))
+    result = vector.iloc[geom_idx[idx]].copy()
+    result["orig_area"] = orig_area
+    result["geometry"] = gpd.GeoSeries(geoms, index=result.index, crs=vector.crs)
+    return cell_idx[idx], result
+
+# %% ../../nbs/12_data.tiling.ipynb 14
+class BlockCache:
+    """
+    Bounded LRU cache of decoded internal blocks (tiles or strips) of rasters. Windows are cut from the cached blocks,
+    so each block is decompressed only once as long as it stays in the cache, regardless of how much the windows overlap.
+    """
+
+    def __init__(self, max_bytes: int = 2**28):
+        self.max_bytes = max_bytes
+        self.blocks = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _block(self, src: rio.DatasetReader, bi: int, bj: int) -> np.ndarray:
+        key = (src.name, bi, bj)
+        if key in self.blocks:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+        self.misses += 1
+        block = src.read(window=src.block_window(1, bi, bj))
+        self.blocks[key] = block
+        self.nbytes += block.nbytes
+        while self.nbytes > self.max_bytes and len(self.blocks) > 1:
+            _, old = self.blocks.popitem(last=False)
+            self.nbytes -= old.nbytes
+        return block
+
+    def read(self, src: rio.DatasetReader, window: rio_windows.Window) -> np.ndarray:
+        "Read `window` from `src`. Areas outside of `src` are filled with zeros"
+        if isinstance(src, RasterMosaic):
+            return src.read(window=window, cache=self)
+        bh, bw = src.block_shapes[0]
+        row_off, col_off = int(window.row_off), int(window.col_off)
+        h, w = int(window.height), int(window.width)
+        out = np.zeros((src.count, h, w), dtype=src.dtypes[0])
+        r0, r1 = max(row_off, 0), min(row_off + h, src.height)
+        c0, c1 = max(col_off, 0), min(col_off + w, src.width)
+        if r1 <= r0 or c1 <= c0:
+            return out
+        for bi, bj in itertools.product(
+            range(r0 // bh, (r1 - 1) // bh + 1), range(c0 // bw, (c1 - 1) // bw + 1)
+        ):
+            block = self._block(src, bi, bj)
+            y0, y1 = max(r0, bi * bh), min(r1, (bi + 1) * bh)
+            x0, x1 = max(c0, bj * bw), min(c1, (bj + 1) * bw)
+            out[:, y0 - row_off : y1 - row_off, x0 - col_off : x1 - col_off] = block[
+                :, y0 - bi * bh : y1 - bi * bh, x0 - bj * bw : x1 - bj * bw
+            ]
+        return out
+
+    def clear(self):
+        "Empty the cache"
+        self.blocks.clear()
+        self.nbytes = 0
+
+# %% ../../nbs/12_data.tiling.ipynb 15
+class RasterMosaic:
+    """
+    Read-only view of several rasters with the same crs, resolution, band count and data type as if they were a single raster,
+    without merging them. The rasters must be aligned to a common pixel grid. Windows are read only from the rasters whose footprints
+    intersect them, found with a spatial index over the footprints.
+    """
+
+    def __init__(self, paths: list):
+        if len(paths) == 0:
+            raise Exception("No rasters to mosaic")
+        self.paths = [str(p) for p in paths]
+        self.datasets = [rio.open(p) for p in self.paths]
+        first = self.datasets[0]
+        for ds in self.datasets:
+            if (
+                ds.crs != first.crs
+                or ds.count != first.count
+                or ds.dtypes[0] != first.dtypes[0]
+            ):
+                raise Exception(
+                    f"{ds.name} has different crs, band count or data type than {first.name}"
+                )
+            if (
+                not np.allclose(ds.res, first.res)
+                or ds.transform.b != 0
+                or ds.transform.d != 0
+            ):
+                raise Exception(
+                    f"{ds.name} has different resolution than {first.name} or is rotated"
+                )
+        res_x, res_y = first.res
+        left, top = min(ds.bounds.left for ds in self.datasets), max(
+            ds.bounds.top for ds in self.datasets
+        )
+        right, bottom = max(ds.bounds.right for ds in self.datasets), min(
+            ds.bounds.bottom for ds in self.datasets
+        )
+        self.transform = rio.Affine(res_x, 0, left, 0, -res_y, top)
+        self.width, self.height = int(round((right - left) / res_x)), int(
+            round((top - bottom) / res_y)
+        )
+        offsets = np.array(
+            [
+                ((top - ds.bounds.top) / res_y, (ds.bounds.left - left) / res_x)
+                for ds in self.datasets
+            ]
+        )
+        if not np.allclose(offsets, np.round(offsets), atol=1e-3):
+            raise Exception("The rasters are not aligned to a common pixel grid")
+        self.offsets = [(int(r), int(c)) for r, c in np.round(offsets)]
+        # Footprints in the pixel coordinates of the mosaic
+        self.footprints = shapely.box(
+            *np.array(
+                [
+                    (c, r, c + ds.width, r + ds.height)
+                    for (r, c), ds in zip(self.offsets, self.datasets)
+                ]
+            ).T
+        )
+        self.tree = shapely.STRtree(self.footprints)
+        self.name = "|".join(self.paths)
+        self.crs, self.gcps, self.count, self.dtypes, self.nodata = (
+            first.crs,
+            ([], None),
+            first.count,
+            first.dtypes,
+            first.nodata,
+        )
+        self.res, self.shape, self.block_shapes = (
+            first.res,
+            (self.height, self.width),
+            first.block_shapes,
+        )
+        self.bounds = rio.coords.BoundingBox(left, bottom, right, top)
+        self.mask_flag_enums = [[MaskFlags.per_dataset]] * self.count
+        self.meta = {
+            **first.meta,
+            "height": self.height,
+            "width": self.width,
+            "transform": self.transform,
+        }
+        self.profile = {
+            **first.profile,
+            "height": self.height,
+            "width": self.width,
+            "transform": self.transform,
+        }
+
+    def _sources(self, window: rio_windows.Window):
+        "Yield the rasters that intersect `window`, the corresponding window in them and the slices of `window` they cover"
+        row_off, col_off, h, w = (
+            int(window.row_off),
+            int(window.col_off),
+            int(window.height),
+            int(window.width),
+        )
+        for i in sorted(
+            self.tree.query(box(col_off, row_off, col_off + w, row_off + h))
+        ):
+            ds, (r, c) = self.datasets[i], self.offsets[i]
+            r0, r1 = max(row_off, r), min(row_off + h, r + ds.height)
+            c0, c1 = max(col_off, c), min(col_off + w, c + ds.width)
+            if r1 <= r0 or c1 <= c0:
+                continue
+            yield ds, rio_windows.Window(c0 - c, r0 - r, c1 - c0, r1 - r0), (
+                slice(r0 - row_off, r1 - row_off),
+                slice(c0 - col_off, c1 - col_off),
+            )
+
+    def read(
+        self, window: rio_windows.Window = None, cache: BlockCache = None
+    ) -> np.ndarray:
+        """Read `window` of the mosaic, through `cache` if it is given. Where the rasters overlap, the first raster with valid data is used,
+        and the areas without any data are filled with nodata, or zeros if nodata is not set
+        """
+        if window is None:
+            window = rio_windows.Window(0, 0, self.width, self.height)
+        out = np.full(
+            (self.count, int(window.height), int(window.width)),
+            self.nodata or 0,
+            dtype=self.dtypes[0],
+        )
+        filled = np.zeros(out.shape[1:], dtype=bool)
+        for ds, src_window, (rows, cols) in self._sources(window):
+            data = (
+                cache.read(ds, src_window)
+                if cache is not None
+                else ds.read(window=src_window)
+            )
+            if all(MaskFlags.all_valid in flags for flags in ds.mask_flag_enums):
+                valid = np.ones(data.shape[1:], dtype=bool)
+            elif ds.nodata is not None:
+                valid = (data != ds.nodata).any(axis=0)
+            else:
+                valid = ds.dataset_mask(window=src_window) > 0
+            take = valid & ~filled[rows, cols]
+            out[:, rows, cols][:, take] = data[:, take]
+            filled[rows, cols] |= take
+        return out
+
+    def dataset_mask(
+        self, out_shape: tuple = None, window: rio_windows.Window = None
+    ) -> np.ndarray:
+        "Read the combined validity mask of the rasters, optionally decimated to `out_shape`, or at full resolution within `window`"
+        if window is not None:
+            mask = np.zeros((int(window.height), int(window.width)), dtype=np.uint8)
+            for ds, src_window, (rows, cols) in self._sources(window):
+                mask[rows, cols] |= ds.dataset_mask(window=src_window)
+            return mask
+        if out_shape is None:
+            out_shape = self.shape
+        mask = np.zeros(out_shape, dtype=np.uint8)
+        sy, sx = out_shape[0] / self.height, out_shape[1] / self.width
+        for ds, (r, c) in zip(self.datasets, self.offsets):
+            r0, r1 = int(round(r * sy)), max(
+                int(round((r + ds.height) * sy)), int(round(r * sy)) + 1
+            )
+            c0, c1 = int(round(c * sx)), max(
+                int(round((c + ds.width) * sx)), int(round(c * sx)) + 1
+            )
+            r1, c1 = min(r1, out_shape[0]), min(c1, out_shape[1])
+            if r1 <= r0 or c1 <= c0:
+                continue
+            mask[r0:r1, c0:c1] |= ds.dataset_mask(out_shape=(r1 - r0, c1 - c0))
+        return mask
+
+    def close(self):
+        for ds in self.datasets:
+            ds.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _raster_files(path_to_raster) -> list:
+    "List the rasters if `path_to_raster` is a list of rasters or a directory, otherwise None"
+    if isinstance(path_to_raster, (list, tuple)):
+        return list(path_to_raster)
+    if os.path.isdir(path_to_raster):
+        return [
+            Path(path_to_raster) / f
+            for f in sorted(os.listdir(path_to_raster))
+            if f.endswith((".tif", ".tiff", ".vrt"))
+        ]
+    return None
+
+
+def open_raster(path_to_raster: Path | str | list):
+    "Open `path_to_raster` as a rasterio dataset, or as a `RasterMosaic` if it is a list of rasters or a directory containing them"
+    files = _raster_files(path_to_raster)
+    if files is not None:
+        return RasterMosaic(files)
+    return rio.open(path_to_raster)
+
+# %% ../../nbs/12_data.tiling.ipynb 16
+def _fingerprint(path: Path | str | list) -> dict | list:
+    "Identify the version of the file in `path`, or of each raster in a list or directory, from its location, size and modification time"
+    files = _raster_files(path)
+    if files is not None:
+        return [_fingerprint(f) for f in files]
+    stat = os.stat(path)
+    return {
+        "path": str(Path(path).resolve()),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def _checksum(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def _read_manifest(manifest: Path, header: dict) -> dict:
+    "Read the records of the completed cells from `manifest`, if it was created with identical `header`"
+    if not os.path.exists(manifest):
+        return {}
+    records = []
+    with open(manifest) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Interrupted write
+    if not records or records[0] != json.loads(json.dumps(header)):
+        return {}
+    return {r["cell"]: r for r in records[1:]}
+
+
+def _write_manifest(manifest: Path, header: dict, records: list) -> None:
+    "Start a new `manifest` with `header` followed by the already completed `records`"
+    with open(manifest, "w") as f:
+        for r in [header, *records]:
+            f.write(json.dumps(r) + "\n")
+
+
+def _append_manifest(manifest: Path, record: dict) -> None:
+    with open(manifest, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _chip_checksum(raster_path: Path, record: dict, chips: np.ndarray = None) -> str:
+    "Compute the checksum of the saved chip of `record`, either a separate file in `raster_path` or a row of `chips`. None if the chip is missing or empty"
+    if record["output"] is None:
+        return None
+    if chips is not None:
+        return (
+            _checksum(chips[record["index"]].tobytes())
+            if record["index"] < len(chips)
+            else None
+        )
+    fname = Path(raster_path) / record["output"]
+    if not fname.exists():
+        return None
+    return _checksum(fname.read_bytes())
+
+# %% ../../nbs/12_data.tiling.ipynb 17
+def _count_block_reads(windows: pd.DataFrame, src: rio.DatasetReader) -> tuple:
+    "Count the internal blocks of `src` covered by `windows` and how many blocks are decoded when each window is read separately"
+    if isinstance(src, RasterMosaic):
+        counts = [
+            _count_block_reads(
+                windows.assign(
+                    row_off=windows.row_off - r, col_off=windows.col_off - c
+                ),
+                ds,
+            )
+            for ds, (r, c) in zip(src.datasets, src.offsets)
+        ]
+        return tuple(int(sum(c)) for c in zip(*counts))
+    height, width, (bh, bw) = src.height, src.width, src.block_shapes[0]
+    r0, r1 = windows.row_off.clip(0, height), (windows.row_off + windows.height).clip(
+        0, height
+    )
+    c0, c1 = windows.col_off.clip(0, width), (windows.col_off + windows.width).clip(
+        0, width
+    )
+    valid = ((r1 > r0) & (c1 > c0)).values
+    bi0, bi1 = (r0 // bh).values[valid], ((r1 - 1) // bh + 1).values[valid]
+    bj0, bj1 = (c0 // bw).values[valid], ((c1 - 1) // bw + 1).values[valid]
+    covered = np.zeros(
+        (int(np.ceil(height / bh)), int(np.ceil(width / bw))), dtype=bool
+    )
+    for i0, i1, j0, j1 in zip(bi0, bi1, bj0, bj1):
+        covered[i0:i1, j0:j1] = True
+    return int(covered.sum()), int(((bi1 - bi0) * (bj1 - bj0)).sum())
+
+
+def _creation_options(
+    dtype: str,
+    compress: str = "lzw",
+    compress_level: int = None,
+    blocksize: int = None,
+    cog: bool = False,
+) -> dict:
+    """GeoTIFF or COG creation options for `compress` codec. LZW, deflate and zstd use a predictor suited for `dtype`, and
+    `compress_level` sets the level of deflate and zstd. `blocksize` sets the size of the internal tiles
+    """
+    compress = compress.lower()
+    if compress not in [
+        "lzw",
+        "deflate",
+        "zstd",
+        "lerc",
+        "lerc_deflate",
+        "lerc_zstd",
+        "none",
+    ]:
+        raise Exception(
+            "Unknown compression, must be one of `lzw`, `deflate`, `zstd`, `lerc`, `lerc_deflate`, `lerc_zstd` or `none`"
+        )
+    opts = {"compress": compress}
+    if compress in ["lzw", "deflate", "zstd"]:
+        if cog:
+            opts["predictor"] = "YES"
+        else:
+            opts["predictor"] = 3 if np.issubdtype(np.dtype(dtype), np.floating) else 2
+    if compress_level is not None and compress in ["deflate", "zstd"]:
+        if cog:
+            opts["level"] = compress_level
+        else:
+            opts["zlevel" if compress == "deflate" else "zstd_level"] = compress_level
+    if blocksize is not None:
+        if cog:
+            opts["blocksize"] = blocksize
+        else:
+            opts.update(tiled=True, blockxsize=blocksize, blockysize=blocksize)
+    return opts
+
+
+def _is_empty(
+    src: rio.DatasetReader, data: np.ndarray, window: rio_windows.Window
+) -> bool:
+    "Check whether `data` read from `window` of `src` has only nodata or masked pixels"
+    if all(MaskFlags.all_valid in flags for flags in src.mask_flag_enums):
+        return False
+    if src.nodata is not None:
+        return bool(
+            (np.isnan(data) if np.isnan(src.nodata) else data == src.nodata).all()
+        )
+    return not src.dataset_mask(window=window).any()
+
+
+def _write_chips(
+    path_to_raster: Path | str,
+    raster_path: Path,
+    cells: list,
+    output_format: str = "gtiff",
+    progress: bool = False,
+    manifest: Path = None,
+    creation_options: dict = None,
+    skip_empty: bool = False,
+) -> tuple:
+    """Read the `(index, name, window)` triplets in `cells` from `path_to_raster` and save them to `raster_path`,
+    either as separate (Cloud-Optimized) GeoTIFFs written with `creation_options` or to the rows `index` of the chip array of a `ChipStore`.
+    Windows are cut from a `BlockCache` that holds two rows of windows, so with row-ordered `cells` each internal block is decoded once.
+    If `skip_empty` is True, the chips without valid pixels are not saved. Each completed chip is recorded to `manifest` if it is given.
+    Returns the number of decoded blocks and the names of the empty chips"""
+    if output_format == "npy":
+        chips = np.load(Path(raster_path) / "chips.npy", mmap_mode="r+")
+    if creation_options is None:
+        creation_options = {"compress": "lzw", "predictor": 2}
+    with open_raster(path_to_raster) as src:
+        if src.gcps[1]:
+            in_crs = src.gcps[1]
+        else:
+            in_crs = src.crs
+        bh, bw = src.block_shapes[0]
+        max_height = max([int(w.height) for _, _, w in cells], default=0)
+        band_rows = 2 * (max_height + bh)
+        cache = BlockCache(
+            band_rows
+            * int(np.ceil(src.width / bw))
+            * bw
+            * src.count
+            * np.dtype(src.dtypes[0]).itemsize
+        )
+        empty = []
+        for i, fname, window in tqdm(cells) if progress else cells:
+            data = cache.read(src, window)
+            if skip_empty and _is_empty(src, data, window):
+                empty.append(fname)
+                output, checksum = None, None
+            elif output_format == "npy":
+                chips[i] = data
+                output, checksum = "chips.npy", _checksum(data.tobytes())
+            else:
+                output = f"{fname}.tif"
+                _write_chip(
+                    src,
+                    data,
+                    window,
+                    in_crs,
+                    Path(raster_path) / output,
+                    creation_options,
+                    cog=output_format == "cog",
+                )
+                checksum = _checksum((Path(raster_path) / output).read_bytes())
+            if manifest is not None:
+                _append_manifest(
+                    manifest,
+                    {
+                        "cell": fname,
+                        "index": int(i),
+                        "output": output,
+                        "checksum": checksum,
+                        "window": [
+                            int(window.col_off),
+                            int(window.row_off),
+                            int(window.width),
+                            int(window.height),
+                        ],
+                    },
+                )
+    if output_format == "npy":
+        chips.flush()
+    return cache.misses, empty
+
+
+def _prune_store(path: Path, manifest: Path, cells: np.ndarray) -> None:
+    "Keep only `cells` in the `ChipStore` in `path`, in their current order, and update the chip indices in `manifest`"
+    store = ChipStore(path)
+    if len(store) == len(cells):
+        return
+    rows = store.index.cell.reset_index().set_index("cell").loc[cells, "index"].values
+    chips = np.lib.format.open_memmap(
+        Path(path) / "chips.npy.part",
+        mode="w+",
+        dtype=store.chips.dtype,
+        shape=(len(rows),) + store.chips.shape[1:],
+    )
+    for k, r in enumerate(rows):
+        chips[k] = store.chips[r]
+    chips.flush()
+    del chips, store.chips
+    os.replace(Path(path) / "chips.npy.part", Path(path) / "chips.npy")
+    store.index.iloc[rows].to_csv(Path(path) / "index.csv", index=False)
+    with open(manifest) as f:
+        header, *records = [json.loads(l) for l in f if l.strip()]
+    new_idx = {c: k for k, c in enumerate(cells)}
+    _write_manifest(
+        manifest,
+        header,
+        [{**r, "index": new_idx.get(r["cell"], r["index"])} for r in records],
+    )
+
+
+def _write_chip(
+    src: rio.DatasetReader,
+    data: np.ndarray,
+    window: rio_windows.Window,
+    crs,
+    fname: Path,
+    creation_options: dict,
+    cog: bool = False,
+) -> None:
+    """Save `data` from `window` of `src` to GeoTIFF `fname`, or to Cloud-Optimized GeoTIFF if `cog` is True.
+    The file is replaced only after it is complete"""
+    prof = src.profile.copy()
+    prof.update(
+        height=window.height,
+        width=window.width,
+        transform=rio_windows.transform(window, src.transform),
+        crs=crs,
+    )
+    tmp = fname.with_name(f"{fname.name}.part")
+    if cog:
+        # COG driver can only copy existing datasets
+        for k in [
+            "blockxsize",
+            "blockysize",
+            "tiled",
+            "compress",
+            "predictor",
+            "interleave",
+        ]:
+            prof.pop(k, None)
+        with MemoryFile() as memfile:
+            with memfile.open(**prof) as mem:
+                mem.write(data)
+                rio_shutil.copy(mem, tmp, driver="COG", **creation_options)
+    else:
+        prof.update(creation_options)
+        with rio.open(tmp, "w", **prof) as dest:
+            dest.write(data)
+    os.replace(tmp, fname)
+
+
+def _has_valid_data(
+    src: rio.DatasetReader,
+    col_off: np.ndarray,
+    row_off: np.ndarray,
+    width: int,
+    height: int,
+    max_pixels: int = 2**24,
+) -> np.ndarray:
+    """Check which windows of `src` contain any valid pixels. If `src` has overviews, the mask of an overview is dilated by one pixel
+    and the windows that cover a valid overview pixel are kept. Otherwise the dataset mask is read in strips of at most `max_pixels`
+    pixels and reduced to blocks that are valid if any of their pixels is, and the windows that only partially cover valid blocks
+    are checked from the mask of the window."""
+    if all(MaskFlags.all_valid in flags for flags in src.mask_flag_enums):
+        return np.ones(len(col_off), dtype=bool)
+    f = max(1, min(width, height) // 16)
+    overviews = (
+        [o for o in src.overviews(1) if o <= f]
+        if isinstance(src, rio.io.DatasetReader)
+        else []
+    )
+    if overviews:
+        # Pixels of the overviews built with nearest resampling can be invalid next to small valid areas
+        oh, ow = -(-src.height // max(overviews)), -(-src.width // max(overviews))
+        mask = np.pad(src.dataset_mask(out_shape=(oh, ow)) > 0, 1)
+        mask = np.any(
+            [
+                mask[1 + i : oh + 1 + i, 1 + j : ow + 1 + j]
+                for i, j in itertools.product([-1, 0, 1], repeat=2)
+            ],
+            axis=0,
+        )
+        (ny, dy), (nx, dx) = (oh, src.height), (ow, src.width)
+    else:
+        mask = np.zeros((-(-src.height // f), -(-src.width // f)), dtype=bool)
+        step = f * max(1, max_pixels // (src.width * f))
+        for r in range(0, src.height, step):
+            strip = (
+                src.dataset_mask(
+                    window=rio_windows.Window(
+                        0, r, src.width, min(step, src.height - r)
+                    )
+                )
+                > 0
+            )
+            strip = np.pad(strip, ((0, -strip.shape[0] % f), (0, -strip.shape[1] % f)))
+            mask[r // f : r // f + strip.shape[0] // f] = strip.reshape(
+                strip.shape[0] // f, f, -1, f
+            ).any(axis=(1, 3))
+        (ny, dy), (nx, dx) = (1, f), (1, f)
+    # Summed area table to count the valid mask pixels in each window in constant time
+    sat = np.pad(mask.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+
+    def _count(r0, r1, c0, c1):
+        r0, c0 = np.clip(r0, 0, mask.shape[0]), np.clip(c0, 0, mask.shape[1])
+        r1, c1 = np.clip(r1, r0, mask.shape[0]), np.clip(c1, c0, mask.shape[1])
+        return sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0]
+
+    # mask pixels that the windows cover at least partially, and completely
+    partial = (
+        _count(
+            row_off * ny // dy,
+            -(-(row_off + height) * ny // dy),
+            col_off * nx // dx,
+            -(-(col_off + width) * nx // dx),
+        )
+        > 0
+    )
+    if overviews:
+        return partial
+    valid = (
+        _count(
+            -(-row_off * ny // dy),
+            (row_off + height) * ny // dy,
+            -(-col_off * nx // dx),
+            (col_off + width) * nx // dx,
+        )
+        > 0
+    )
+    bounds = rio_windows.Window(0, 0, src.width, src.height)
+    for i in np.flatnonzero(partial & ~valid):
+        window = rio_windows.Window(col_off[i], row_off[i], width, height).intersection(
+            bounds
+        )
+        valid[i] = (src.dataset_mask(window=window) > 0).any()
+    return valid
+
+
+def _read_label_map(label_map: Path | str) -> dict:
+    "Read the class encoding from `label_map`, written by `Tiler.tile_and_rasterize_vector`"
+    with open(label_map) as f:
+        return {
+            c: int(i)
+            for c, i in (l.rstrip("\n").rsplit(": ", 1) for l in f if l.strip())
+        }
+
+
+def _encode_labels(
+    values: pd.Series, label_map: Path | str = None, all_values: pd.Series = None
+) -> tuple:
+    """Encode class `values` to integers starting from 1, either according to an existing `label_map` file or in sorted order
+    of `all_values`, or of `values` if they are not given. Returns the codes and the encoding
+    """
+    values = pd.Series(values)
+    if label_map is None:
+        le = LabelEncoder().fit(
+            values.values if all_values is None else pd.Series(all_values).values
+        )
+        codes = (
+            le.transform(values.values) + 1
+        )  # We want the labels to start from 1 as 0 is background most of the time
+        return codes, {c: i + 1 for c, i in zip(le.classes_, le.transform(le.classes_))}
+    classes = _read_label_map(label_map)
+    codes = values.astype(str).map(classes)
+    if codes.isna().any():
+        raise Exception(
+            f"Classes {sorted(values[codes.isna()].astype(str).unique())} are not in `label_map`"
+        )
+    return codes.values.astype(int), classes
+
+
+def _instance_edges(inst: np.ndarray) -> np.ndarray:
+    "Mark the pixels of instances in `inst` that have a 4-neighbour belonging to another instance or background. The outermost pixels are never marked"
+    c = inst[1:-1, 1:-1]
+    edges = np.zeros(inst.shape, dtype=bool)
+    edges[1:-1, 1:-1] = (c > 0) & (
+        (c != inst[:-2, 1:-1])
+        | (c != inst[2:, 1:-1])
+        | (c != inst[1:-1, :-2])
+        | (c != inst[1:-1, 2:])
+    )
+    return edges
+
+
+def _rasterize_strip(
+    strip: dict,
+    meta: dict,
+    outpath: Path,
+    instance_ids: bool = False,
+    edges: bool = False,
+) -> int:
+    """Burn the shapes of `strip` into a single array covering all of its cells, and write the masks of the cells from slices of it.
+    `strip` contains the pixel window of the strip, the shapes with their labels and instance IDs, and the names and windows of the cells to write.
+    If `instance_ids` or `edges`, instance IDs are burned and the class, instance and edge bands are all derived from them.
+    """
+    sw, pad = strip["window"], int(
+        edges
+    )  # Edges need the neighbouring pixels outside of the strip
+    multi = instance_ids or edges
+    arr = np.zeros(
+        (sw.height + 2 * pad, sw.width + 2 * pad),
+        dtype="uint32" if multi else meta["dtype"],
+    )
+    if len(strip["geoms"]):
+        bw = rio_windows.Window(
+            sw.col_off - pad, sw.row_off - pad, sw.width + 2 * pad, sw.height + 2 * pad
+        )
+        rio_features.rasterize(
+            zip(strip["geoms"], strip["ids"] if multi else strip["labels"]),
+            out=arr,
+            transform=rio_windows.transform(bw, meta["transform"]),
+        )
+    if multi:
+        # IDs are sorted, so the class of each pixel is found with a binary search
+        labels = np.concatenate([[0], strip["labels"]])[
+            np.where(arr > 0, np.searchsorted(strip["ids"], arr) + 1, 0)
+        ]
+        bands = [labels] + [arr] * instance_ids + [_instance_edges(arr)] * edges
+        arr = np.stack(bands)[:, pad : pad + sw.height, pad : pad + sw.width].astype(
+            meta["dtype"]
+        )
+    else:
+        arr = arr[None]
+    for cell, w in strip["cells"]:
+        prof = {
+            **meta,
+            "height": w.height,
+            "width": w.width,
+            "transform": rio_windows.transform(w, meta["transform"]),
+        }
+        with rio.open(outpath / f"{cell}.tif", "w", **prof) as dest:
+            dest.write(
+                arr[
+                    :,
+                    w.row_off - sw.row_off : w.row_off - sw.row_off + w.height,
+                    w.col_off - sw.col_off : w.col_off - sw.col_off + w.width,
+                ]
+            )
+            if multi:
+                dest.descriptions = tuple(
+                    ["class"] + ["instance"] * instance_ids + ["edge"] * edges
+                )
+    return len(strip["cells"])
+
+
+def _annotated_cells(
+    cells: np.ndarray,
+    crs,
+    annotations: Path | str,
+    gpkg_layer: str = None,
+    bg_fraction: float = 0.0,
+    seed: int = 0,
+) -> np.ndarray:
+    "Get a mask of the `cells` that intersect with the geometries in `annotations`, and of a random `bg_fraction` of the rest"
+    if len(cells) == 0:
+        return np.zeros(0, dtype=bool)
+    vector = read_vector(
+        annotations,
+        layer=gpkg_layer,
+        columns=[],
+        bbox=shapely.total_bounds(cells),
+        bbox_crs=crs,
+    ).to_crs(crs)
+    keep = np.zeros(len(cells), dtype=bool)
+    keep[vector.sindex.query(cells, predicate="intersects")[0]] = True
+    bg = np.flatnonzero(~keep)
+    rng = np.random.default_rng(seed)
+    keep[rng.choice(bg, size=int(round(bg_fraction * len(bg))), replace=False)] = True
+    return keep
+
+
+def _window_boxes(
+    tfm: rio.Affine, col_off: np.ndarray, row_off: np.ndarray, width: int, height: int
+) -> np.ndarray:
+    "Get the bounding boxes of pixel windows in the coordinates of the raster with transform `tfm`"
+    x0, y0 = (
+        tfm.c + col_off * tfm.a + row_off * tfm.b,
+        tfm.f + col_off * tfm.d + row_off * tfm.e,
+    )
+    x1 = tfm.c + (col_off + width) * tfm.a + (row_off + height) * tfm.b
+    y1 = tfm.f + (col_off + width) * tfm.d + (row_off + height) * tfm.e
+    return shapely.box(
+        np.minimum(x0, x1), np.minimum(y0, y1), np.maximum(x0, x1), np.maximum(y0, y1)
+    )
+
+
+def _grid_windows(grid: gpd.GeoDataFrame, tfm: rio.Affine) -> pd.DataFrame:
+    "Get the pixel windows of the cells of `grid` in the raster with transform `tfm`, for grids that are not created with `Tiler.create_grid`"
+    wins = [
+        rio_windows.from_bounds(*b, transform=tfm).round_offsets().round_lengths()
+        for b in grid.bounds.values
+    ]
+    return pd.DataFrame(
+        {
+            "cell": grid.cell.values,
+            "col_off": [int(w.col_off) for w in wins],
+            "row_off": [int(w.row_off) for w in wins],
+            "width": [int(w.width) for w in wins],
+            "height": [int(w.height) for w in wins],
+        }
+    )
+
+# %% ../../nbs/12_data.tiling.ipynb 18
 class Tiler:
     """
     Handles the tiling of raster and vector data into smaller patches that each have the same coverage.
@@ -51,6 +906,8 @@ class Tiler:
     ):
         store_attr()
         self.grid = None
+        self.windows = None
+        self.read_stats = None
         if not os.path.exists(outpath):
             os.makedirs(outpath)
         self.outpath = Path(self.outpath)
@@ -58,58 +915,304 @@ class Tiler:
         self.vector_path = self.outpath / "vectors"
         self.rasterized_vector_path = self.outpath / "rasterized_vectors"
 
-    def tile_raster(
-        self, path_to_raster: Path | str, allow_partial_data: bool = False
+    def create_grid(
+        self,
+        path_to_raster: Path | str | list,
+        allow_partial_data: bool = False,
+        skip_empty: bool = False,
+        annotations: Path | str = None,
+        gpkg_layer: str = None,
+        bg_fraction: float = 0.0,
+        seed: int = 0,
     ) -> None:
-        "Tiles specified raster to `self.gridsize_x` times `self.gridsize_y` grid, with `self.overlap` pixel overlap"
-        names = []
-        polys = []
-        col_id = 0
-        row_id = 0
+        """Computes the tiling grid for `path_to_raster` from its shape and transform, and sets `self.grid` and `self.windows`, the pixel window of each cell.
+        Pixel data is read only if `skip_empty` is True.
+        """
+        if (
+            annotations is not None
+            and Path(annotations).suffix == ".gpkg"
+            and not gpkg_layer
+        ):
+            raise Exception("`annotations` is .gpkg but no `gpkg_layer` specified")
+        if not 0 <= bg_fraction <= 1:
+            raise Exception("`bg_fraction` must be between 0 and 1")
+        with open_raster(path_to_raster) as src:
+            y, x = src.shape
+            tfm = src.transform
+            if src.gcps[1]:
+                in_crs = src.gcps[1]
+            else:
+                in_crs = src.crs
+            rows = np.arange(0, y, self.gridsize_y - self.overlap[1])
+            cols = np.arange(0, x, self.gridsize_x - self.overlap[0])
+            iy, ix = [
+                i.ravel()
+                for i in np.meshgrid(
+                    np.arange(len(rows)), np.arange(len(cols)), indexing="ij"
+                )
+            ]
+            dy, dx = rows[iy], cols[ix]
+            if not allow_partial_data:
+                full = (dy + self.gridsize_y <= y) & (dx + self.gridsize_x <= x)
+                iy, ix, dy, dx = iy[full], ix[full], dy[full], dx[full]
+            if skip_empty:
+                valid = _has_valid_data(src, dx, dy, self.gridsize_x, self.gridsize_y)
+                iy, ix, dy, dx = iy[valid], ix[valid], dy[valid], dx[valid]
+        polys = _window_boxes(tfm, dx, dy, self.gridsize_x, self.gridsize_y)
+        if annotations is not None:
+            keep = _annotated_cells(
+                polys, in_crs, annotations, gpkg_layer, bg_fraction, seed
+            )
+            iy, ix, dy, dx, polys = iy[keep], ix[keep], dy[keep], dx[keep], polys[keep]
+        names = [f"R{r}C{c}" for r, c in zip(iy, ix)]
+        self.source_raster = path_to_raster
+        self.grid = gpd.GeoDataFrame({"cell": names, "geometry": polys}, crs=in_crs)
+        self.windows = pd.DataFrame(
+            {
+                "cell": names,
+                "col_off": dx,
+                "row_off": dy,
+                "width": self.gridsize_x,
+                "height": self.gridsize_y,
+            }
+        )
+        return
 
+    def sample_grid(
+        self,
+        path_to_raster: Path | str | list,
+        annotations: Path | str,
+        n_samples: int,
+        column: str = None,
+        gpkg_layer: str = None,
+        class_balanced: bool = True,
+        jitter: float = 0.25,
+        allow_partial_data: bool = False,
+        seed: int = 0,
+    ) -> None:
+        """Samples `n_samples` patches centred on the centroids of the features in `annotations`, instead of tiling the whole raster with a regular grid.
+        Sets `self.grid` and `self.windows` like `Tiler.create_grid`, with cells named `S{i}`.
+        """
+        if Path(annotations).suffix == ".gpkg" and not gpkg_layer:
+            raise Exception("`annotations` is .gpkg but no `gpkg_layer` specified")
+        with open_raster(path_to_raster) as src:
+            y, x = src.shape
+            tfm = src.transform
+            if src.gcps[1]:
+                in_crs = src.gcps[1]
+            else:
+                in_crs = src.crs
+        if not allow_partial_data and (x < self.gridsize_x or y < self.gridsize_y):
+            raise Exception(
+                "Raster is smaller than the patch size, use `allow_partial_data=True`"
+            )
+        vector = read_vector(
+            annotations,
+            layer=gpkg_layer,
+            columns=[column] if column else [],
+            bbox=shapely.total_bounds(
+                _window_boxes(tfm, np.array([0]), np.array([0]), x, y)
+            ),
+            bbox_crs=in_crs,
+        )
+        vector = vector.to_crs(in_crs)
+        if len(vector) == 0:
+            raise Exception("No annotations within the raster")
+        if column and class_balanced:
+            weights = 1 / vector[column].map(vector[column].value_counts()).values
+        else:
+            weights = np.ones(len(vector))
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(len(vector), size=n_samples, p=weights / weights.sum())
+        centroids = shapely.centroid(np.asarray(vector.geometry)[idx])
+        cx, cy = ~tfm * (shapely.get_x(centroids), shapely.get_y(centroids))
+        cx = cx + rng.uniform(-jitter, jitter, n_samples) * self.gridsize_x
+        cy = cy + rng.uniform(-jitter, jitter, n_samples) * self.gridsize_y
+        dx, dy = np.round(cx - self.gridsize_x / 2).astype(int), np.round(
+            cy - self.gridsize_y / 2
+        ).astype(int)
+        if not allow_partial_data:
+            dx, dy = np.clip(dx, 0, x - self.gridsize_x), np.clip(
+                dy, 0, y - self.gridsize_y
+            )
+        names = [f"S{i}" for i in range(n_samples)]
+        self.source_raster = path_to_raster
+        self.grid = gpd.GeoDataFrame(
+            {
+                "cell": names,
+                "geometry": _window_boxes(
+                    tfm, dx, dy, self.gridsize_x, self.gridsize_y
+                ),
+            },
+            crs=in_crs,
+        )
+        self.windows = pd.DataFrame(
+            {
+                "cell": names,
+                "col_off": dx,
+                "row_off": dy,
+                "width": self.gridsize_x,
+                "height": self.gridsize_y,
+            }
+        )
+        return
+
+    def get_window(self, cell: str) -> rio_windows.Window:
+        "Get the pixel window of `cell` in the tiled raster"
+        row = self.windows[self.windows.cell == cell].iloc[0]
+        return rio_windows.Window(row.col_off, row.row_off, row.width, row.height)
+
+    def tile_raster(
+        self,
+        path_to_raster: Path | str | list,
+        allow_partial_data: bool = False,
+        n_workers: int = 1,
+        output_format: str = "gtiff",
+        skip_empty: bool = False,
+        resume: bool = False,
+        compress: str = "lzw",
+        compress_level: int = None,
+        blocksize: int = None,
+        annotations: Path | str = None,
+        gpkg_layer: str = None,
+        bg_fraction: float = 0.0,
+        seed: int = 0,
+        keep_grid: bool = False,
+    ) -> None:
+        """Tiles specified raster to `self.gridsize_x` times `self.gridsize_y` grid, with `self.overlap` pixel overlap.
+        The patches are saved as separate GeoTIFFs or into a single `ChipStore`, depending on `output_format`.
+        """
+        if output_format not in ["gtiff", "cog", "npy"]:
+            raise Exception(
+                "Unknown output format, must be one of `gtiff`, `cog` or `npy`"
+            )
+        with open_raster(path_to_raster) as src:
+            dtype = src.dtypes[0]
+        creation_options = _creation_options(
+            dtype, compress, compress_level, blocksize, cog=output_format == "cog"
+        )
         if not os.path.exists(self.raster_path):
             os.makedirs(self.raster_path)
-        with rio.open(path_to_raster) as src:
-            y, x = src.shape
-            for (iy, dy), (ix, dx) in tqdm(
-                itertools.product(
-                    enumerate(range(0, y, self.gridsize_y - self.overlap[1])),
-                    enumerate(range(0, x, self.gridsize_x - self.overlap[0])),
-                )
-            ):
+        if not keep_grid:
+            # empty patches are dropped from the data that is read anyway
+            self.create_grid(
+                path_to_raster,
+                allow_partial_data=allow_partial_data,
+                annotations=annotations,
+                gpkg_layer=gpkg_layer,
+                bg_fraction=bg_fraction,
+                seed=seed,
+            )
+        elif self.grid is None:
+            raise Exception(
+                "No grid to keep, use Tiler.create_grid or Tiler.sample_grid first"
+            )
+        manifest = Path(f"{self.raster_path}.manifest.jsonl")
+        header = {
+            "source": _fingerprint(path_to_raster),
+            "gridsize": [self.gridsize_x, self.gridsize_y],
+            "overlap": list(self.overlap),
+            "allow_partial_data": allow_partial_data,
+            "skip_empty": skip_empty,
+            "output_format": output_format,
+            "creation_options": creation_options,
+            "annotations": (
+                _fingerprint(annotations) if annotations is not None else None
+            ),
+            "gpkg_layer": gpkg_layer,
+            "bg_fraction": bg_fraction,
+            "seed": seed,
+            "windows": _checksum(
+                self.windows[["col_off", "row_off", "width", "height"]]
+                .values.astype("int64")
+                .tobytes()
+            ),
+        }
+        done = {}
+        if resume:
+            chips = None
+            if output_format == "npy" and ChipStore.is_store(self.raster_path):
+                chips = np.load(Path(self.raster_path) / "chips.npy", mmap_mode="r")
+            if output_format != "npy" or chips is not None:
+                done = {
+                    c: r
+                    for c, r in _read_manifest(manifest, header).items()
+                    if _chip_checksum(self.raster_path, r, chips) == r["checksum"]
+                }
+        _write_manifest(manifest, header, done.values())
+        cells = [
+            (
+                row.Index,
+                row.cell,
+                rio_windows.Window(row.col_off, row.row_off, row.width, row.height),
+            )
+            for row in self.windows.itertuples()
+            if row.cell not in done
+        ]
+        if output_format == "npy" and not done:
+            ChipStore.create(self.raster_path, path_to_raster, self.grid, self.windows)
 
-                if dy + self.gridsize_y > y and not allow_partial_data:
-                    continue
-                if dx + self.gridsize_x > x and not allow_partial_data:
-                    continue
-                window = rio_windows.Window.from_slices(
-                    (dy, dy + self.gridsize_y), (dx, dx + self.gridsize_x)
+        if n_workers > 1:
+            # Several shards per worker to even out the load, each shard opens its own dataset handle
+            shard_size = max(1, int(np.ceil(len(cells) / (n_workers * 4))))
+            shards = [
+                cells[i : i + shard_size] for i in range(0, len(cells), shard_size)
+            ]
+            with ProcessPoolExecutor(max_workers=n_workers) as ex:
+                results = list(
+                    tqdm(
+                        ex.map(
+                            _write_chips,
+                            itertools.repeat(path_to_raster),
+                            itertools.repeat(self.raster_path),
+                            shards,
+                            itertools.repeat(output_format),
+                            itertools.repeat(False),
+                            itertools.repeat(manifest),
+                            itertools.repeat(creation_options),
+                            itertools.repeat(skip_empty),
+                        ),
+                        total=len(shards),
+                    )
+                )
+        else:
+            results = [
+                _write_chips(
+                    path_to_raster,
+                    self.raster_path,
+                    cells,
+                    output_format,
+                    progress=True,
+                    manifest=manifest,
+                    creation_options=creation_options,
+                    skip_empty=skip_empty,
                 )
-                prof = src.profile.copy()
-                if src.gcps[1]:
-                    in_crs = src.gcps[1]
-                else:
-                    in_crs = src.crs
-                prof.update(
-                    height=window.height,
-                    width=window.width,
-                    transform=rio_windows.transform(window, src.transform),
-                    compress="lzw",
-                    predictor=2,
-                    crs=in_crs,
+            ]
+        decoded = sum(r[0] for r in results)
+        with open_raster(path_to_raster) as src:
+            blocks, uncached = _count_block_reads(
+                self.windows.loc[[c[0] for c in cells]], src
+            )
+        self.read_stats = {
+            "blocks": blocks,
+            "uncached_reads": uncached,
+            "cached_reads": decoded,
+            "uncached_amplification": uncached / max(blocks, 1),
+            "cached_amplification": decoded / max(blocks, 1),
+        }
+        if skip_empty:
+            empty = set(
+                itertools.chain(
+                    *(r[1] for r in results),
+                    (c for c, r in done.items() if r["output"] is None),
                 )
-                fname = f"R{iy}C{ix}"
-                data = src.read(window=window)
-                if data.shape[1] < window.height or data.shape[2] < window.width:
-                    newdata = np.zeros((data.shape[0], window.height, window.width))
-                    newdata[:, : data.shape[1], : data.shape[2]] = data
-                    data = newdata
-                with rio.open(f"{self.raster_path}/{fname}.tif", "w", **prof) as dest:
-                    dest.write(data)
-                    polys.append(box(*dest.bounds))
-                names.append(fname)
-
-            self.grid = gpd.GeoDataFrame({"cell": names, "geometry": polys}, crs=in_crs)
+            )
+            keep = ~self.windows.cell.isin(empty).values
+            self.grid, self.windows = self.grid[keep].reset_index(
+                drop=True
+            ), self.windows[keep].reset_index(drop=True)
+            if output_format == "npy":
+                _prune_store(self.raster_path, manifest, self.windows.cell.values)
         return
 
     def tile_vector(
@@ -118,6 +1221,10 @@ class Tiler:
         min_area_pct: float = 0.0,
         gpkg_layer: str = None,
         output_format: str = "geojson",
+        resume: bool = False,
+        single_layer: bool = False,
+        batch_size: int = 100000,
+        columns: list = None,
     ) -> None:
         """
         Tiles a vector data file into smaller tiles. Converts all multipolygons to a regular polygons.
@@ -125,7 +1232,7 @@ class Tiler:
         """
         if self.grid is None:
             raise Exception(
-                "No raster grid specified, use Tiler.tile_raster to determine grid limits"
+                "No raster grid specified, use Tiler.tile_raster or Tiler.create_grid to determine grid limits"
             )
 
         if Path(path_to_vector).suffix == ".gpkg" and not gpkg_layer:
@@ -134,44 +1241,139 @@ class Tiler:
             )
 
         if output_format == "geojson":
+            if single_layer:
+                raise Exception(
+                    "`single_layer` is supported only for `gpkg` output, `parquet` output is always a single file"
+                )
             if not os.path.exists(self.vector_path):
                 os.makedirs(self.vector_path)
-        elif output_format == "gpkg":
-            outfile = self.outpath / "vectors.gpkg"
+            manifest = Path(f"{self.vector_path}.manifest.jsonl")
+        elif output_format in ["gpkg", "parquet"]:
+            outfile = self.outpath / f"vectors.{output_format}"
+            manifest = Path(f"{outfile}.manifest.jsonl")
+            single_layer = single_layer or output_format == "parquet"
         else:
-            raise Exception("Unknown output format, must be either `geojson` or `gpkg`")
+            raise Exception(
+                "Unknown output format, must be one of `geojson`, `gpkg` or `parquet`"
+            )
+
+        header = {
+            "source": _fingerprint(path_to_vector),
+            "gpkg_layer": gpkg_layer,
+            "min_area_pct": min_area_pct,
+            "output_format": output_format,
+            "single_layer": single_layer,
+            "columns": columns,
+            "grid": _checksum(b"".join(shapely.to_wkb(np.asarray(self.grid.geometry)))),
+        }
+        done = {}
+        if resume:
+            if single_layer:
+                # The single output file is replaced only after it is complete, so it's either completely done or not at all
+                done = (
+                    _read_manifest(manifest, header) if os.path.exists(outfile) else {}
+                )
+                if len(done) < len(self.grid):
+                    done = {}
+            else:
+                layers = (
+                    fiona.listlayers(outfile)
+                    if output_format == "gpkg" and os.path.exists(outfile)
+                    else []
+                )
+                # Cells without annotations have no output, and layers in a geopackage are written in a single transaction
+                done = {
+                    c: r
+                    for c, r in _read_manifest(manifest, header).items()
+                    if r["output"] is None
+                    or (
+                        r["output"] in layers
+                        if output_format == "gpkg"
+                        else _chip_checksum(self.vector_path, r) == r["checksum"]
+                    )
+                }
+        _write_manifest(manifest, header, done.values())
 
-        vector = gpd.read_file(path_to_vector, layer=gpkg_layer)
+        vector = read_vector(
+            path_to_vector,
+            layer=gpkg_layer,
+            columns=columns,
+            bbox=self.grid.total_bounds,
+            bbox_crs=self.grid.crs,
+        )
         vector = vector.to_crs(self.grid.crs)
-        sindex = vector.sindex
-        for row in tqdm(self.grid.itertuples()):
-            possible_matches_index = list(sindex.intersection(row.geometry.bounds))
-            tempvector = vector.iloc[possible_matches_index].copy()
-            tempvector["orig_area"] = tempvector.geometry.area
-            tempvector = tempvector.clip(row.geometry, keep_geom_type=True)
-
-            if min_area_pct < 0 or min_area_pct > 1:
-                print("Invalid minimum area percentage set, defaulting to 0")
-            tempvector = tempvector[
-                tempvector.geometry.area >= tempvector.orig_area * min_area_pct
-            ]
+        if min_area_pct < 0 or min_area_pct > 1:
+            print("Invalid minimum area percentage set, defaulting to 0")
+            min_area_pct = 0.0
+        todo = np.flatnonzero(~self.grid.cell.isin(list(done)).values)
+        cell_idx, clipped = _clip_to_cells(
+            vector, np.asarray(self.grid.geometry)[todo], min_area_pct
+        )
+        if single_layer:
+            if len(todo) == 0:
+                return
+            clipped = clipped.assign(
+                cell=self.grid.cell.values[todo[cell_idx]]
+            ).reset_index(drop=True)
+            tmp = outfile.with_name(f"{outfile.stem}.part{outfile.suffix}")
+            if output_format == "parquet":
+                write_vector(clipped, tmp)
+            else:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                for start in tqdm(range(0, max(len(clipped), 1), batch_size)):
+                    write_vector(
+                        clipped.iloc[start : start + batch_size],
+                        tmp,
+                        layer="vectors",
+                        mode="a" if start else "w",
+                    )
+            os.replace(tmp, outfile)
+            has_data = set(clipped.cell)
+            _write_manifest(
+                manifest,
+                header,
+                [
+                    {
+                        "cell": c,
+                        "output": outfile.name if c in has_data else None,
+                        "checksum": None,
+                    }
+                    for c in self.grid.cell
+                ],
+            )
+            return
+        starts, ends = np.searchsorted(cell_idx, np.arange(len(todo))), np.searchsorted(
+            cell_idx, np.arange(len(todo)), side="right"
+        )
+        for i, start, end in tqdm(zip(todo, starts, ends), total=len(todo)):
+            cell = self.grid.cell.iloc[i]
             # No annotations -> no output file
-            if len(tempvector) == 0:
+            if start == end:
+                _append_manifest(
+                    manifest, {"cell": cell, "output": None, "checksum": None}
+                )
                 continue
-            tempvector["geometry"] = tempvector.apply(
-                lambda row: (
-                    fix_multipolys(row.geometry)
-                    if row.geometry.geom_type == "MultiPolygon"
-                    else shapely.geometry.Polygon(row.geometry.exterior)
-                ),
-                axis=1,
-            )
+            tempvector = clipped.iloc[start:end]
             if output_format == "geojson":
-                tempvector.to_file(
-                    f"{self.vector_path}/{row.cell}.geojson", driver="GeoJSON"
+                fname = self.vector_path / f"{cell}.geojson"
+                write_vector(
+                    tempvector, fname.with_name(f"{fname.name}.part"), driver="GeoJSON"
+                )
+                os.replace(fname.with_name(f"{fname.name}.part"), fname)
+                _append_manifest(
+                    manifest,
+                    {
+                        "cell": cell,
+                        "output": fname.name,
+                        "checksum": _checksum(fname.read_bytes()),
+                    },
                 )
             elif output_format == "gpkg":
-                tempvector.to_file(outfile, layer=row.cell)
+                write_vector(tempvector, outfile, layer=cell)
+                _append_manifest(
+                    manifest, {"cell": cell, "output": cell, "checksum": None}
+                )
         return
 
     def tile_and_rasterize_vector(
@@ -181,15 +1383,20 @@ class Tiler:
         column: str,
         gpkg_layer: str = None,
         keep_bg_only: bool = False,
+        n_workers: int = 1,
+        max_strip_pixels: int = 2**26,
+        instance_ids: bool = False,
+        edges: bool = False,
+        label_map: Path | str = None,
     ) -> None:
         """
-        Rasterizes vectors based on tiled rasters. Saves label map to `self.outpath`.
+        Rasterizes vectors based on the tiling grid of `path_to_raster`, so the raster patches don't need to be written first. Saves label map to `self.outpath`.
         By default only keeps the patches that contain polygon data, by specifying `keep_bg_only=True` saves also masks for empty patches.
         """
 
         if self.grid is None:
             raise Exception(
-                "No raster grid specified, use Tiler.tile_raster to determine grid limits"
+                "No raster grid specified, use Tiler.tile_raster or Tiler.create_grid to determine grid limits"
             )
 
         if Path(path_to_vector).suffix == ".gpkg" and not gpkg_layer:
@@ -200,79 +1407,474 @@ class Tiler:
         if not os.path.exists(self.rasterized_vector_path):
             os.makedirs(self.rasterized_vector_path)
 
-        vector = gpd.read_file(path_to_vector)
+        vector = read_vector(
+            path_to_vector,
+            layer=gpkg_layer,
+            columns=[column],
+            bbox=self.grid.total_bounds,
+            bbox_crs=self.grid.crs,
+        )
         vector = vector.to_crs(self.grid.crs)
-        le = LabelEncoder()
-        vector["label"] = (
-            le.fit_transform(vector[column].values) + 1
-        )  # We want the labels to start from 1 as 0 is background most of the time
+        # the encoding is fitted to all features so that it does not depend on the extent of the raster
+        all_values = (
+            None
+            if label_map
+            else read_vector(
+                path_to_vector, layer=gpkg_layer, columns=[column], read_geometry=False
+            )[column]
+        )
+        vector["label"], classes = _encode_labels(vector[column], label_map, all_values)
         with open(self.outpath / "label_map.txt", "w") as f:
-            for c, i in zip(le.classes_, le.transform(le.classes_)):
-                f.write(f"{c}: {i+1}\n")
-        for r in tqdm([f for f in os.listdir(self.raster_path) if f.endswith("tif")]):
-            with rio.open(self.raster_path / r) as src:
-                out_meta = src.meta
-                out_meta.update({"count": 1})
-                tempvector = vector.clip(box(*src.bounds), keep_geom_type=False)
-
-                with rio.open(
-                    self.rasterized_vector_path / r, "w+", **out_meta
-                ) as dest:
-                    dest_arr = dest.read(1)
-                    if len(tempvector) == 0:
-                        if keep_bg_only:
-                            dest.write_band(1, dest_arr)
-                        continue
-                    shapes = (
-                        (geom, value)
-                        for geom, value in zip(tempvector.geometry, tempvector["label"])
-                    )
-                    burned = rio.features.rasterize(
-                        shapes=shapes, fill=0, out=dest_arr, transform=dest.transform
-                    )
-                    dest.write_band(1, burned)
+            for c, i in classes.items():
+                f.write(f"{c}: {i}\n")
+        with open_raster(path_to_raster) as src:
+            src_meta = src.meta.copy()
+        # grids that are assigned or loaded without `Tiler.create_grid` have no windows yet
+        if self.windows is None:
+            self.windows = _grid_windows(self.grid, src_meta["transform"])
+        src_meta.update(
+            {"driver": "GTiff", "count": 1 + instance_ids + edges, "crs": self.grid.crs}
+        )
+        if instance_ids:
+            src_meta["dtype"] = "uint32"
+
+        geoms, labels, ids = (
+            np.asarray(vector.geometry),
+            vector["label"].values.astype("uint32"),
+            np.arange(1, len(vector) + 1, dtype="uint32"),
+        )
+        has_data = np.zeros(len(self.grid), dtype=bool)
+        has_data[
+            vector.sindex.query(np.asarray(self.grid.geometry), predicate="intersects")[
+                0
+            ]
+        ] = True
+        keep = has_data | keep_bg_only
+        windows = self.windows[keep]
+        col_min, col_max = (
+            windows.col_off.min(),
+            (windows.col_off + windows.width).max(),
+        )
+        # Consecutive grid rows are grouped into strips of at most `max_strip_pixels`, but at least one row of cells
+        rows, starts = np.unique(windows.row_off.values), []
+        for r in rows:
+            if (
+                not starts
+                or (r + self.gridsize_y - starts[-1]) * (col_max - col_min)
+                > max_strip_pixels
+            ):
+                starts.append(r)
+        strip_idx = np.searchsorted(starts, windows.row_off.values, side="right") - 1
+        strips = []
+        for _, cells in windows.groupby(strip_idx, sort=True):
+            sw = rio_windows.Window(
+                col_min,
+                cells.row_off.min(),
+                col_max - col_min,
+                (cells.row_off + cells.height).max() - cells.row_off.min(),
+            )
+            pad = int(edges)  # Edges depend on the pixels just outside of the strip
+            qw = rio_windows.Window(
+                sw.col_off - pad,
+                sw.row_off - pad,
+                sw.width + 2 * pad,
+                sw.height + 2 * pad,
+            )
+            idx = np.sort(
+                vector.sindex.query(box(*rio_windows.bounds(qw, src_meta["transform"])))
+            )
+            strips.append(
+                {
+                    "window": sw,
+                    "geoms": geoms[idx],
+                    "labels": labels[idx],
+                    "ids": ids[idx],
+                    "cells": [
+                        (
+                            r.cell,
+                            rio_windows.Window(r.col_off, r.row_off, r.width, r.height),
+                        )
+                        for r in cells.itertuples()
+                    ],
+                }
+            )
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as ex:
+                results = ex.map(
+                    _rasterize_strip,
+                    strips,
+                    itertools.repeat(src_meta),
+                    itertools.repeat(self.rasterized_vector_path),
+                    itertools.repeat(instance_ids),
+                    itertools.repeat(edges),
+                )
+                for _ in tqdm(results, total=len(strips)):
+                    pass
+        else:
+            for strip in tqdm(strips):
+                _rasterize_strip(
+                    strip, src_meta, self.rasterized_vector_path, instance_ids, edges
+                )
         return
 
-# %% ../../nbs/12_data.tiling.ipynb 30
-def untile_raster(
-    path_to_targets: Path | str, outfile: Path | str, method: str = "first"
-):
-    """Merge multiple patches from `path_to_targets` into a single raster`"""
+# %% ../../nbs/12_data.tiling.ipynb 44
+def benchmark_codecs(
+    path_to_raster: Path | str,
+    codecs: list = None,
+    gridsize_x: int = 400,
+    gridsize_y: int = 400,
+    n_windows: int = 16,
+    blocksize: int = None,
+    output_format: str = "gtiff",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Save `n_windows` randomly sampled windows of `path_to_raster` with each of the `(compress, compress_level)` pairs in `codecs`,
+    and report the write and read throughput in megabytes of uncompressed data per second and the average size of the patches on disk.
+    By default compares all lossless codecs suitable for the data type of `path_to_raster`.
+    """
+    if output_format not in ["gtiff", "cog"]:
+        raise Exception("Unknown output format, must be either `gtiff` or `cog`")
+    rng = np.random.default_rng(seed)
+    with open_raster(path_to_raster) as src, tempfile.TemporaryDirectory() as tmpdir:
+        if src.gcps[1]:
+            in_crs = src.gcps[1]
+        else:
+            in_crs = src.crs
+        if codecs is None:
+            codecs = [
+                ("none", None),
+                ("lzw", None),
+                ("deflate", 6),
+                ("zstd", 1),
+                ("zstd", 9),
+            ]
+            if np.issubdtype(np.dtype(src.dtypes[0]), np.floating):
+                codecs += [("lerc", None), ("lerc_zstd", None)]
+        rows = rng.integers(0, max(src.height - gridsize_y, 0) + 1, n_windows)
+        cols = rng.integers(0, max(src.width - gridsize_x, 0) + 1, n_windows)
+        windows = [
+            rio_windows.Window(int(c), int(r), gridsize_x, gridsize_y)
+            for r, c in zip(rows, cols)
+        ]
+        cache = BlockCache()
+        chips = [cache.read(src, w) for w in windows]
+        nbytes = sum(c.nbytes for c in chips)
+        results = []
+        for compress, compress_level in codecs:
+            opts = _creation_options(
+                src.dtypes[0],
+                compress,
+                compress_level,
+                blocksize,
+                cog=output_format == "cog",
+            )
+            fnames = [
+                Path(tmpdir) / f"{compress}_{compress_level}_{i}.tif"
+                for i in range(n_windows)
+            ]
+            start = time.perf_counter()
+            for w, c, f in zip(windows, chips, fnames):
+                _write_chip(src, c, w, in_crs, f, opts, cog=output_format == "cog")
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for f in fnames:
+                with rio.open(f) as chip:
+                    chip.read()
+            read_time = time.perf_counter() - start
+            size = sum(os.path.getsize(f) for f in fnames)
+            results.append(
+                {
+                    "compress": compress,
+                    "compress_level": compress_level,
+                    "write_mb_s": nbytes / 1e6 / write_time,
+                    "read_mb_s": nbytes / 1e6 / read_time,
+                    "bytes_per_patch": size / n_windows,
+                    "ratio": nbytes / size,
+                }
+            )
+    return pd.DataFrame(results)
+
+# %% ../../nbs/12_data.tiling.ipynb 72
+class ChipStore:
+    """
+    Packed storage for the patches of a tiled raster. The patches are saved to a single memory-mappable array `chips.npy`
+    with shape `(n_cells, bands, height, width)`, the cell names, transforms and bounds to `index.csv` and the
+    CRS, data type and nodata value to `meta.json`.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.index = pd.read_csv(self.path / "index.csv", float_precision="round_trip")
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.chips = np.load(self.path / "chips.npy", mmap_mode="r")
+        self.crs = rio.crs.CRS.from_wkt(self.meta["crs"]) if self.meta["crs"] else None
+        self._cells = {c: i for i, c in enumerate(self.index.cell)}
+
+    @staticmethod
+    def is_store(path: Path | str) -> bool:
+        "Check whether `path` is a `ChipStore`"
+        return os.path.isdir(path) and os.path.exists(Path(path) / "chips.npy")
+
+    @staticmethod
+    def create(
+        path: Path | str,
+        path_to_raster: Path | str,
+        grid: gpd.GeoDataFrame,
+        windows: pd.DataFrame,
+    ):
+        "Create an empty store to `path` for the cells of `grid`, with the data type and band count of `path_to_raster`"
+        with open_raster(path_to_raster) as src:
+            tfms = [
+                rio_windows.transform(
+                    rio_windows.Window(row.col_off, row.row_off, row.width, row.height),
+                    src.transform,
+                )
+                for row in windows.itertuples()
+            ]
+            chips = np.lib.format.open_memmap(
+                Path(path) / "chips.npy",
+                mode="w+",
+                dtype=src.dtypes[0],
+                shape=(
+                    len(windows),
+                    src.count,
+                    int(windows.height.max()),
+                    int(windows.width.max()),
+                ),
+            )
+            del chips
+            meta = {
+                "crs": grid.crs.to_wkt() if grid.crs else None,
+                "dtype": src.dtypes[0],
+                "nodata": src.nodata,
+            }
+        index = pd.DataFrame({"cell": windows.cell})
+        for i, c in enumerate("abcdef"):
+            index[c] = [t[i] for t in tfms]
+        index[["minx", "miny", "maxx", "maxy"]] = grid.bounds.values
+        index.to_csv(Path(path) / "index.csv", index=False)
+        with open(Path(path) / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _idx(self, key: int | str) -> int:
+        return self._cells[key] if isinstance(key, str) else key
+
+    def __getitem__(self, key: int | str) -> np.ndarray:
+        "Get a patch by either its index or cell name. The patch is a view to the memory-mapped array"
+        return self.chips[self._idx(key)]
+
+    def get_transform(self, key: int | str) -> rio.Affine:
+        "Get the affine transform of a patch"
+        return rio.Affine(*self.index.iloc[self._idx(key)][list("abcdef")])
+
+    def get_profile(self, key: int | str) -> dict:
+        "Get a profile that can be used to save a patch as a GeoTIFF"
+        return {
+            "driver": "GTiff",
+            "dtype": self.meta["dtype"],
+            "nodata": self.meta["nodata"],
+            "count": self.chips.shape[1],
+            "height": self.chips.shape[2],
+            "width": self.chips.shape[3],
+            "crs": self.crs,
+            "transform": self.get_transform(key),
+        }
 
+# %% ../../nbs/12_data.tiling.ipynb 78
+class _HandlePool:
+    "Bounded LRU pool of open rasters, so that at most `max_open` files are open at the same time"
+
+    def __init__(self, max_open: int = 64):
+        self.max_open, self.handles = max_open, OrderedDict()
+
+    def get(self, path: str) -> rio.DatasetReader:
+        if path in self.handles:
+            self.handles.move_to_end(path)
+            return self.handles[path]
+        self.handles[path] = rio.open(path)
+        while len(self.handles) > self.max_open:
+            self.handles.popitem(last=False)[1].close()
+        return self.handles[path]
+
+    def close(self):
+        for src in self.handles.values():
+            src.close()
+        self.handles.clear()
+
+
+def _chip_footprints(path_to_targets: Path | str):
+    """Get the transform, shape, output profile and a reader function of the patches in `path_to_targets`.
+    Only the metadata of the GeoTIFFs is read and the files are closed afterwards"""
+    if ChipStore.is_store(path_to_targets):
+        store = ChipStore(path_to_targets)
+        _, _, h, w = store.chips.shape
+        tfms = [store.get_transform(i) for i in range(len(store))]
+        shapes = [(h, w)] * len(store)
+
+        def read(i, window):
+            chip = np.asarray(store[i][(slice(None),) + window.toslices()])
+            return (
+                chip
+                if store.meta["nodata"] is None
+                else np.ma.masked_equal(chip, store.meta["nodata"])
+            )
+
+        return tfms, shapes, store.get_profile(0), read, None
     rasters = [
         f"{path_to_targets}/{f}"
         for f in os.listdir(path_to_targets)
         if f.endswith(".tif")
     ]
+    tfms, shapes = [], []
+    for f in rasters:
+        with rio.open(f) as src:
+            tfms.append(src.transform)
+            shapes.append(src.shape)
+            if src.gcps[1]:
+                in_crs = src.gcps[1]
+            else:
+                in_crs = src.crs
+            profile = src.meta.copy()
+    profile.update({"driver": "GTiff", "crs": in_crs})
+    pool = _HandlePool()
 
-    if method == "sum":
-        method = copy_sum
+    def read(i, window):
+        return pool.get(rasters[i]).read(window=window, masked=True)
 
-    files_to_mosaic = []
+    return tfms, shapes, profile, read, pool
 
-    for f in rasters:
-        src = rio.open(f)
-        if src.gcps[1]:
-            in_crs = src.gcps[1]
-        else:
-            in_crs = src.crs
-        files_to_mosaic.append(src)
 
-    mosaic, out_tfm = rio_merge(files_to_mosaic, method=method)
+def blending_window(
+    height: int, width: int, kind: str = "cosine", sigma: float = 0.25
+) -> np.ndarray:
+    """Weights for blending a patch of shape `(height, width)` with overlapping patches. `kind` is either `uniform`, `cosine` or `gaussian`,
+    and `sigma` is the standard deviation of the `gaussian` window relative to the patch size. The weights are largest at the center
+    and positive up to the edges, so that pixels covered by only one patch keep their values
+    """
+
+    def _window(n):
+        x = (np.arange(n) + 0.5) / n
+        if kind == "uniform":
+            return np.ones(n)
+        if kind == "cosine":
+            return np.sin(np.pi * x)
+        if kind == "gaussian":
+            return np.exp(-0.5 * ((x - 0.5) / sigma) ** 2)
+        raise Exception(
+            f"Unknown blending window {kind}, must be one of ['uniform', 'cosine', 'gaussian']"
+        )
+
+    return np.outer(_window(height), _window(width))
 
-    out_meta = src.meta.copy()
-    out_meta.update(
+
+def untile_raster(
+    path_to_targets: Path | str,
+    outfile: Path | str,
+    method: str = "first",
+    blend: str = None,
+    sigma: float = 0.25,
+    max_strip_pixels: int = 2**26,
+    max_open: int = 64,
+):
+    """Merge multiple patches from `path_to_targets`, either a directory of GeoTIFFs or a `ChipStore`, into a single raster.
+    `method` is one of the merge methods of `rasterio.merge.merge` or a function with the same signature, and is ignored if `blend` is given.
+    """
+    tfms, shapes, profile, read, pool = _chip_footprints(path_to_targets)
+    if pool is not None:
+        pool.max_open = max_open
+    if blend is not None:
+        blending_window(1, 1, blend)
+    elif method == "sum":
+        method = copy_sum
+    elif not callable(method):
+        if method not in MERGE_METHODS:
+            raise Exception(
+                f"Unknown merge method {method}, must be one of {list(MERGE_METHODS.keys())}"
+            )
+        method = MERGE_METHODS[method]
+    res_x, res_y = tfms[0].a, tfms[0].e
+    west, north = min(t.c for t in tfms), max(t.f for t in tfms)
+    east = max(t.c + res_x * w for t, (_, w) in zip(tfms, shapes))
+    south = min(t.f + res_y * h for t, (h, _) in zip(tfms, shapes))
+    width, height = int(round((east - west) / res_x)), int(
+        round((south - north) / res_y)
+    )
+    col_offs = [int(round((t.c - west) / res_x)) for t in tfms]
+    row_offs = [int(round((t.f - north) / res_y)) for t in tfms]
+    # Footprints in the pixel coordinates of the output
+    tree = shapely.STRtree(
+        shapely.box(
+            *np.array(
+                [
+                    (c, r, c + w, r + h)
+                    for c, r, (h, w) in zip(col_offs, row_offs, shapes)
+                ]
+            ).T
+        )
+    )
+    nodata = profile["nodata"] if profile["nodata"] is not None else 0
+    if blend is not None and not np.issubdtype(profile["dtype"], np.floating):
+        profile["dtype"] = "float32"
+    profile.update(
         {
-            "driver": "GTiff",
-            "height": mosaic.shape[1],
-            "width": mosaic.shape[2],
-            "transform": out_tfm,
-            "crs": in_crs,
+            "height": height,
+            "width": width,
+            "transform": rio.Affine(res_x, 0, west, 0, res_y, north),
         }
     )
-
-    with rio.open(outfile, "w", **out_meta) as dest:
-        dest.write(mosaic)
+    rows_per_strip = max(1, max_strip_pixels // width)
+    weights = {}
+    try:
+        with rio.open(outfile, "w", **profile) as dest:
+            for r0 in tqdm(range(0, height, rows_per_strip)):
+                r1 = min(r0 + rows_per_strip, height)
+                strip = np.full(
+                    (profile["count"], r1 - r0, width), nodata, dtype=profile["dtype"]
+                )
+                if blend is not None:
+                    acc, wsum = np.zeros(strip.shape), np.zeros(strip.shape)
+                for i in sorted(tree.query(box(0, r0, width, r1))):
+                    c, r, (h, w) = col_offs[i], row_offs[i], shapes[i]
+                    cr0, cr1 = max(r0, r), min(r1, r + h)
+                    if cr1 <= cr0:
+                        continue
+                    chip = read(i, rio_windows.Window(0, cr0 - r, w, cr1 - cr0))
+                    if blend is not None:
+                        if (h, w) not in weights:
+                            weights[(h, w)] = blending_window(h, w, blend, sigma)
+                        wt = weights[(h, w)][cr0 - r : cr1 - r] * ~np.ma.getmaskarray(
+                            chip
+                        )
+                        acc[:, cr0 - r0 : cr1 - r0, c : c + w] += wt * np.ma.getdata(
+                            chip
+                        )
+                        wsum[:, cr0 - r0 : cr1 - r0, c : c + w] += wt
+                        continue
+                    region = strip[:, cr0 - r0 : cr1 - r0, c : c + w]
+                    region_mask = (
+                        np.isnan(region) if np.isnan(nodata) else region == nodata
+                    )
+                    # same arguments as in `rasterio.merge.merge`, with the offsets in the output raster
+                    chip = np.ma.asarray(chip)
+                    method(
+                        region,
+                        chip,
+                        region_mask,
+                        np.ma.getmaskarray(chip),
+                        index=i,
+                        roff=cr0,
+                        coff=c,
+                    )
+                if blend is not None:
+                    np.divide(acc, wsum, out=strip, where=wsum > 0, casting="unsafe")
+                dest.write(strip, window=rio_windows.Window(0, r0, width, r1 - r0))
+    finally:
+        if pool is not None:
+            pool.close()
 
 
 def copy_sum(merged_data, new_data, merged_mask, new_mask, **kwargs):
@@ -286,30 +1888,66 @@ def untile_vector(
     outpath: Path | str,
     non_max_suppression_thresh: float = 0.0,
     nms_criterion: str = "score",
+    n_workers: int = 8,
+    grid: gpd.GeoDataFrame = None,
+    merge_split: bool = False,
+    label_col: str = None,
+    nms_workers: int = 1,
 ):
-    "Create single GIS-file from a directory of predicted .shp or .geojson files"
+    """Create single GIS-file from a directory of predicted .shp, .geojson or .parquet files, from a geopackage or from a GeoParquet file.
+    If `grid`, such as `Tiler.grid`, is given and `nms_workers` > 1, non-max suppression is done cell by cell with `do_tiled_nms`.
+    """
+    if merge_split and grid is None:
+        raise Exception("Merging split instances requires `grid`")
+    grid_cells = grid is not None
     if os.path.isdir(path_to_targets):  # directory
-        pred_files = [
-            f for f in os.listdir(path_to_targets) if f.endswith((".shp", ".geojson"))
+        sources = [
+            (f"{path_to_targets}/{f}", None)
+            for f in os.listdir(path_to_targets)
+            if f.endswith((".shp", ".geojson", ".parquet"))
         ]
-        gdf = None
-        for p in tqdm(pred_files):
-            temp_gdf = gpd.read_file(f"{path_to_targets}/{p}")
-            if gdf is None:
-                gdf = temp_gdf
-            else:
-                gdf = pd.concat((gdf, temp_gdf))
     elif Path(path_to_targets).suffix == ".gpkg":  # geopackage
-        layers = fiona.listlayers(path_to_targets)
-        gdf = None
-        for l in tqdm(layers):
-            temp_gdf = gpd.read_file(path_to_targets, layer=l)
-            if gdf is None:
-                gdf = temp_gdf
-            else:
-                gdf = pd.concat((gdf, temp_gdf))
+        sources = [(path_to_targets, l) for l in fiona.listlayers(path_to_targets)]
+    elif (
+        Path(path_to_targets).suffix == ".parquet"
+    ):  # GeoParquet with the cells in `cell` column
+        sources = [(path_to_targets, None)]
+        grid_cells = False
+    else:
+        raise Exception(
+            f"Unsupported input {path_to_targets}, must be a directory, a geopackage or a GeoParquet file"
+        )
+    if not sources:
+        raise Exception(f"No vector files found from {path_to_targets}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_workers) as ex:
+        gdfs = list(
+            tqdm(
+                ex.map(lambda s: read_vector(s[0], layer=s[1]), sources),
+                total=len(sources),
+            )
+        )
+    if grid_cells:
+        gdfs = [
+            g.assign(cell=l if l else Path(f).stem) for g, (f, l) in zip(gdfs, sources)
+        ]
+    gdf = pd.concat(gdfs, ignore_index=True)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Read {len(sources)} files or layers in {elapsed:.1f} s ({len(sources)/elapsed:.1f} files/s, {len(gdf)/elapsed:.0f} polygons/s)"
+    )
     print(f"{len(gdf)} polygons")
-    if non_max_suppression_thresh != 0:
+    if merge_split:
+        gdf = merge_split_instances(
+            gdf, grid, label_col=label_col, n_workers=nms_workers
+        )
+        print(f"{len(gdf)} polygons after merging split instances")
+    if non_max_suppression_thresh != 0 and grid is not None and nms_workers > 1:
+        gdf = do_tiled_nms(
+            gdf, grid, non_max_suppression_thresh, nms_criterion, n_workers=nms_workers
+        )
+        print(f"{len(gdf)} polygons after non-max suppression")
+    elif non_max_suppression_thresh != 0:
         np_bounding_boxes = np.array([b.bounds for b in gdf.geometry])
         scores = gdf.score.values
         idxs = non_max_suppression_fast(
@@ -320,8 +1958,7 @@ def untile_vector(
         )
         gdf = gdf.iloc[idxs]
         print(f"{len(gdf)} polygons after non-max suppression")
-    if outpath.endswith("shp"):
-        gdf.to_file(outpath)
-    elif outpath.endswith("geojson"):
-        gdf.to_file(outpath, driver="GeoJSON")
+    if grid_cells:
+        gdf = gdf.drop(columns="cell")
+    write_vector(gdf, outpath)
     return
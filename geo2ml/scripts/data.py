@@ -27,8 +27,9 @@ def sample_points(
     rename_target: str = None,  # If provided, target column is renamed to this
     band_names: Path = None,  # Path to a file providing bands to use as rows
     dropna_value: int = None,  # Drop all rows with all values equal to this value
-    out_prefix: str = "",
-):  # Prefix for outputs
+    out_prefix: str = "",  # Prefix for outputs
+    within_raster: bool = False,
+):  # Only sample the points within the bounds of `input_raster`
     "Sample pixel values from `input_raster` using `sampling_locations`"
 
     if band_names:
@@ -36,7 +37,11 @@ def sample_points(
             bandnames = [l.strip() for l in f.readlines()]
 
     gdf = sample_raster_with_points(
-        sampling_locations, input_raster, target_column, band_names=band_names
+        sampling_locations,
+        input_raster,
+        target_column,
+        band_names=band_names,
+        within_raster=within_raster,
     )
 
     df = gdf.drop(columns=["geometry"])
@@ -79,8 +84,9 @@ def sample_polygons(
     rename_target: str = None,  # If provided, target column is renamed to this
     band_names: Path = None,  # Path to a file providing bands to use as rows
     dropna_value: int = None,  # Drop all rows with all values equal to this value
-    out_prefix: str = "",
-):  # Prefix for outputs
+    out_prefix: str = "",  # Prefix for outputs
+    within_raster: bool = False,
+):  # Only sample the polygons intersecting the bounds of `input_raster`
     "Sample pixel values from `input_raster` using `sampling_locations`."
 
     stats = []
@@ -110,6 +116,7 @@ def sample_polygons(
         band_names=band_names,
         stats=stats,
         categorical=categorical,
+        within_raster=within_raster,
     )
 
     df = gdf.drop(columns=["geometry"])
@@ -147,6 +154,7 @@ def create_raster_dataset(
     gridsize_y: int = 256,  # Size of tiles in y-axis in pixels
     overlap_x: int = 0,  # Overlap of tiles in x-axis in pixels
     overlap_y: int = 0,  # Overlap of tiles in y-axis in pixels
+    resume: bool = False,  # Only create the patches that are missing from a previous interrupted run
 ):
     "Create a semantic segmentation dataset from a `raster_path` and corresponding mask `mask_path`. Raster image patches are saved to `outpath/raster_tiles` and mask patches to `outpath/mask_tiles`"
     tiler = Tiler(
@@ -155,14 +163,14 @@ def create_raster_dataset(
         gridsize_y=gridsize_y,
         overlap=(overlap_x, overlap_y),
     )
-    tiler.tile_raster(raster_path, allow_partial_data=allow_partial_data)
+    tiler.tile_raster(raster_path, allow_partial_data=allow_partial_data, resume=resume)
 
     polygon_extensions = [".shp", ".geojson", ".gpkg"]
     raster_extensions = [".tif"]
 
     if mask_path.suffix in raster_extensions:
         tiler.raster_path = outpath / "mask_images"
-        tiler.tile_raster(mask_path)
+        tiler.tile_raster(mask_path, resume=resume)
     elif mask_path.suffix in polygon_extensions:
         if not target_column:
             raise Exception(
@@ -189,7 +197,7 @@ def create_coco_dataset(
     dataset_name: str,  # Name of the dataset
     gpkg_layer: str = None,  # If `polygon_path` is a geopackage, specify the layer used. Ignored otherwise.
     min_area_pct: float = 0.0,  # How small polygons keep after tiling?
-    output_format: str = "geojson",  # Which format to use for saving, either 'geojson' or 'gpkg'
+    output_format: str = "geojson",  # Which format to use for saving, either 'geojson', 'gpkg' or 'parquet'
     save_grid: bool = False,  # Should tiling grid be saved
     allow_partial_data: bool = False,  # Whether to create tiles that have only partial image data
     gridsize_x: int = 320,  # Size of tiles in x-axis in pixels
@@ -198,6 +206,9 @@ def create_coco_dataset(
     overlap_y: int = 0,  # Overlap of tiles in y-axis in pixels
     ann_format: str = "box",  # Annotation format, either box, polygon or rotated box
     min_bbox_area: int = 0,  # Minimum bounding gox area in pixels. Smaller objects than this are discarded
+    resume: bool = False,  # Only create the tiles that are missing from a previous interrupted run
+    sparse: bool = False,  # Only tile the cells that contain annotations
+    bg_fraction: float = 0.0,  # With `sparse`, fraction of the cells without annotations that are tiled as well
 ):
     "Create a COCO-format dataset from `raster` and `polygon` shapefile"
     tiler = Tiler(
@@ -206,15 +217,26 @@ def create_coco_dataset(
         gridsize_y=gridsize_y,
         overlap=(overlap_x, overlap_y),
     )
-    tiler.tile_raster(raster_path, allow_partial_data=allow_partial_data)
+    tiler.tile_raster(
+        raster_path,
+        allow_partial_data=allow_partial_data,
+        resume=resume,
+        annotations=polygon_path if sparse else None,
+        gpkg_layer=gpkg_layer,
+        bg_fraction=bg_fraction,
+    )
     tiler.tile_vector(
         polygon_path,
         min_area_pct=min_area_pct,
         gpkg_layer=gpkg_layer,
         output_format=output_format,
+        resume=resume,
+        columns=[target_column],
     )
 
-    cats = gpd.read_file(polygon_path)[target_column].unique()
+    cats = read_vector(polygon_path, layer=gpkg_layer, columns=[target_column])[
+        target_column
+    ].unique()
 
     coco_cats = [
         {"supercategory": "object", "id": i + 1, "name": c} for i, c in enumerate(cats)
@@ -234,6 +256,8 @@ def create_coco_dataset(
             vector_path = outpath / "vectors"
         case "gpkg":
             vector_path = outpath / "vectors.gpkg"
+        case "parquet":
+            vector_path = outpath / "vectors.parquet"
 
     shp_to_coco(
         outpath / "images",
@@ -259,7 +283,7 @@ def create_yolo_dataset(
     dataset_name: str = None,  # Optional name of the dataset
     gpkg_layer: str = None,  # If `polygon_path` is a geopackage, specify the layer used. Ignored otherwise.
     min_area_pct: float = 0.0,  # How small polygons keep after tiling?
-    output_format: str = "geojson",  # Which format to use for saving, either 'geojson' or 'gpkg'
+    output_format: str = "geojson",  # Which format to use for saving, either 'geojson', 'gpkg' or 'parquet'
     save_grid: bool = False,  # Should tiling grid be saved
     allow_partial_data: bool = False,  # Whether to create tiles that have only partial image data
     gridsize_x: int = 320,  # Size of tiles in x-axis, pixels
@@ -268,6 +292,9 @@ def create_yolo_dataset(
     overlap_y: int = 0,  # Overlap of tiles in y-axis
     ann_format: str = "box",  # Annotation format, either box, polygon or rotated box
     min_bbox_area: int = 0,  # Minimum bounding box area in pixels. Smaller objects than this are discarded
+    resume: bool = False,  # Only create the tiles that are missing from a previous interrupted run
+    sparse: bool = False,  # Only tile the cells that contain annotations
+    bg_fraction: float = 0.0,  # With `sparse`, fraction of the cells without annotations that are tiled as well
 ):
     "Create a YOLO-format dataset from `raster` and `polygon` shapefile"
     tiler = Tiler(
@@ -276,20 +303,33 @@ def create_yolo_dataset(
         gridsize_y=gridsize_y,
         overlap=(overlap_x, overlap_y),
     )
-    tiler.tile_raster(raster_path, allow_partial_data=allow_partial_data)
+    tiler.tile_raster(
+        raster_path,
+        allow_partial_data=allow_partial_data,
+        resume=resume,
+        annotations=polygon_path if sparse else None,
+        gpkg_layer=gpkg_layer,
+        bg_fraction=bg_fraction,
+    )
     tiler.tile_vector(
         polygon_path,
         min_area_pct=min_area_pct,
         gpkg_layer=gpkg_layer,
         output_format=output_format,
+        resume=resume,
+        columns=[target_column],
     )
-    cats = gpd.read_file(polygon_path)[target_column].unique()
+    cats = read_vector(polygon_path, layer=gpkg_layer, columns=[target_column])[
+        target_column
+    ].unique()
 
     match output_format:
         case "geojson":
             vector_path = outpath / "vectors"
         case "gpkg":
             vector_path = outpath / "vectors.gpkg"
+        case "parquet":
+            vector_path = outpath / "vectors.parquet"
 
     shp_to_yolo(
         outpath / "images",